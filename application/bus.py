@@ -0,0 +1,292 @@
+"""Shared memory telemetry bus between processes.
+
+Every ingest process writes positions to its own shared memory segment,
+so each segment has a single producer and needs no locks. A segment
+holds a ring of the most recent positions and a table of the latest
+position of every IMEI seen by its producer:
+
+    header | ring: capacity x ENTRY | table: table_size x ENTRY
+
+Ring entries end with their sequence number, written after the data,
+so readers can tell written, overwritten and torn entries apart. Table
+entries end with a version that is odd while the entry is being written
+(a seqlock). Readers unpack entries straight from the shared buffer.
+
+Segments are named "<prefix>-<index>". They are not removed when their
+producer crashes, so a restarted worker continues the same segment.
+"""
+
+import os
+import struct
+import sys
+from datetime import datetime
+from multiprocessing import resource_tracker, shared_memory
+from typing import NamedTuple
+
+from framework.utils import LazyAVLDataRecord
+
+PREFIX = "telematica"
+RING_CAPACITY = 65_536
+# Power of two, large enough for the vehicles of one producer.
+TABLE_SIZE = 131_072
+
+MAGIC = 0x54454C4D
+# magic, ring capacity, table size, last written sequence number, instance
+HEADER = struct.Struct("<IIQQQ")
+SEQUENCE_OFFSET = 16
+HEADER_SIZE = 64
+# imei, timestamp_ms, latitude, longitude, altitude, angle, speed, sequence
+ENTRY = struct.Struct("<QqddhHH2xQ")
+ENTRY_SEQUENCE = ENTRY.size - 8
+U64 = struct.Struct("<Q")
+# Attempts to read a table entry that is being written.
+READ_ATTEMPTS = 1000
+
+
+class Position(NamedTuple):
+    """Position of a vehicle, with the record field names of AVL records."""
+
+    imei: str
+    timestamp_ms: int
+    latitude: float
+    longitude: float
+    altitude: int
+    angle: int
+    speed: int
+
+    @property
+    def timestamp(self) -> str:
+        return datetime.fromtimestamp(self.timestamp_ms / 1000).isoformat()
+
+    @property
+    def text(self) -> str:
+        """Return simple representation of the position."""
+        return f"{self.timestamp}: Lat: {self.latitude}, Lon: {self.longitude}, speed: {self.speed}"
+
+
+def _position(fields: tuple) -> Position:
+    imei, *values, _ = fields
+    return Position(str(imei), *values)
+
+
+def segment_name(index: int, prefix: str = PREFIX) -> str:
+    return f"{prefix}-{index}"
+
+
+def _open(name: str, create: bool = False, size: int = 0):
+    """Open a segment without removing it when this process exits."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, create, size, track=False)
+    shm = shared_memory.SharedMemory(name, create, size)
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+class BusWriter:
+    """Producer side of one bus segment."""
+
+    def __init__(
+        self,
+        name: str,
+        capacity: int = RING_CAPACITY,
+        table_size: int = TABLE_SIZE,
+    ):
+        size = HEADER_SIZE + (capacity + table_size) * ENTRY.size
+        try:
+            self.shm = _open(name, create=True, size=size)
+            instance = int.from_bytes(os.urandom(8), "little")
+            HEADER.pack_into(self.shm.buf, 0, MAGIC, capacity, table_size, 0, instance)
+        except FileExistsError:
+            self.shm = _open(name)
+        buf = self.buf = self.shm.buf
+        magic, self.capacity, self.table_size, self.sequence, _ = HEADER.unpack_from(
+            buf, 0
+        )
+        if magic != MAGIC:
+            raise ValueError(f"{name} is not a telemetry bus segment")
+        self.table_offset = HEADER_SIZE + self.capacity * ENTRY.size
+        # IMEI -> table slot, rebuilt from the table of a reused segment.
+        self.slots: dict[int, int] = {}
+        for slot in range(self.table_size):
+            offset = self.table_offset + slot * ENTRY.size
+            imei = U64.unpack_from(buf, offset)[0]
+            if imei:
+                self.slots[imei] = slot
+                version = U64.unpack_from(buf, offset + ENTRY_SEQUENCE)[0]
+                if version % 2:
+                    # The previous producer died while writing the entry.
+                    U64.pack_into(buf, offset + ENTRY_SEQUENCE, version + 1)
+        self.table_full = 0
+
+    def publish(self, imei: str, record: LazyAVLDataRecord):
+        """Append a position to the ring and update the latest position table."""
+        buf = self.buf
+        key = int(imei)
+        values = (
+            record.timestamp_ms,
+            record.latitude,
+            record.longitude,
+            record.altitude,
+            record.angle,
+            record.speed,
+        )
+
+        self.sequence += 1
+        sequence = self.sequence
+        offset = HEADER_SIZE + sequence % self.capacity * ENTRY.size
+        U64.pack_into(buf, offset + ENTRY_SEQUENCE, 0)
+        ENTRY.pack_into(buf, offset, key, *values, sequence)
+        U64.pack_into(buf, SEQUENCE_OFFSET, sequence)
+
+        slot = self.slots.get(key)
+        if slot is None:
+            slot = self._insert(key)
+            if slot is None:
+                self.table_full += 1
+                return
+        offset = self.table_offset + slot * ENTRY.size
+        version = U64.unpack_from(buf, offset + ENTRY_SEQUENCE)[0]
+        U64.pack_into(buf, offset + ENTRY_SEQUENCE, version + 1)
+        ENTRY.pack_into(buf, offset, key, *values, version + 2)
+
+    def _insert(self, key: int) -> int | None:
+        """Claim a free table slot by linear probing."""
+        if len(self.slots) >= self.table_size * 3 // 4:
+            return None
+        mask = self.table_size - 1
+        slot = hash(key) & mask
+        while U64.unpack_from(self.buf, self.table_offset + slot * ENTRY.size)[0]:
+            slot = (slot + 1) & mask
+        self.slots[key] = slot
+        return slot
+
+    def close(self):
+        """Detach from the segment; it stays available for the next producer."""
+        self.buf = None
+        self.shm.close()
+
+    def unlink(self):
+        """Remove the segment, when the producer stops for good."""
+        if sys.version_info < (3, 13):
+            # unlink() unregisters the segment from the resource tracker.
+            resource_tracker.register(self.shm._name, "shared_memory")
+        self.shm.unlink()
+
+
+class BusReader:
+    """Consumer side of one bus segment.
+
+    A reader starts at the newest position of the ring. Positions that
+    were overwritten before they were read are counted in lost.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.shm = _open(name)
+        buf = self.buf = self.shm.buf
+        magic, self.capacity, self.table_size, self.next, self.instance = (
+            HEADER.unpack_from(buf, 0)
+        )
+        if magic != MAGIC:
+            raise ValueError(f"{name} is not a telemetry bus segment")
+        self.next += 1
+        self.table_offset = HEADER_SIZE + self.capacity * ENTRY.size
+        self.lost = 0
+
+    def poll(self, limit: int = RING_CAPACITY) -> list[Position]:
+        """Return positions written since the last poll, oldest first."""
+        buf = self.buf
+        last = U64.unpack_from(buf, SEQUENCE_OFFSET)[0]
+        if last - self.next + 1 > self.capacity:
+            oldest = last - self.capacity + 1
+            self.lost += oldest - self.next
+            self.next = oldest
+        positions = []
+        while self.next <= last and len(positions) < limit:
+            sequence = self.next
+            offset = HEADER_SIZE + sequence % self.capacity * ENTRY.size
+            fields = ENTRY.unpack_from(buf, offset)
+            # The entry must not have been overwritten while it was read.
+            if (
+                fields[-1] != sequence
+                or U64.unpack_from(buf, offset + ENTRY_SEQUENCE)[0] != sequence
+            ):
+                self.lost += 1
+            else:
+                positions.append(_position(fields))
+            self.next += 1
+        return positions
+
+    def _entry(self, slot: int) -> tuple | None:
+        offset = self.table_offset + slot * ENTRY.size
+        buf = self.buf
+        for _ in range(READ_ATTEMPTS):
+            version = U64.unpack_from(buf, offset + ENTRY_SEQUENCE)[0]
+            if version % 2:
+                continue
+            fields = ENTRY.unpack_from(buf, offset)
+            if U64.unpack_from(buf, offset + ENTRY_SEQUENCE)[0] == version:
+                return fields if fields[0] else None
+        return None
+
+    def latest(self) -> list[Position]:
+        """Latest position of every vehicle of the producer."""
+        positions = []
+        for slot in range(self.table_size):
+            offset = self.table_offset + slot * ENTRY.size
+            if U64.unpack_from(self.buf, offset)[0]:
+                fields = self._entry(slot)
+                if fields is not None:
+                    positions.append(_position(fields))
+        return positions
+
+    def get(self, imei: str) -> Position | None:
+        """Latest position of a vehicle, None if the producer has not seen it."""
+        key = int(imei)
+        mask = self.table_size - 1
+        slot = hash(key) & mask
+        while True:
+            fields = self._entry(slot)
+            if fields is None:
+                return None
+            if fields[0] == key:
+                return _position(fields)
+            slot = (slot + 1) & mask
+
+    def replaced(self) -> bool:
+        """Whether the segment was removed and created again by a producer."""
+        try:
+            shm = _open(self.name)
+        except FileNotFoundError:
+            return False
+        try:
+            return HEADER.unpack_from(shm.buf, 0)[4] != self.instance
+        finally:
+            shm.close()
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+
+
+def attach_readers(
+    readers: dict[str, BusReader], prefix: str = PREFIX, limit: int = 1024
+) -> list[BusReader]:
+    """Attach to segments "<prefix>-0", "<prefix>-1", ... not yet in readers.
+
+    Readers of segments created again by their producer are replaced.
+    Returns the new readers. Stops at the first missing segment.
+    """
+    attached = []
+    for index in range(limit):
+        name = segment_name(index, prefix)
+        if name in readers:
+            if not readers[name].replaced():
+                continue
+            readers.pop(name).close()
+        try:
+            reader = readers[name] = BusReader(name)
+        except FileNotFoundError:
+            break
+        attached.append(reader)
+    return attached
@@ -1,12 +1,18 @@
 """Vehicle and records data objects."""
 
-import asyncio
+import math
+import time
+from array import array
+from collections.abc import Iterator
 from dataclasses import dataclass
 
-from framework.utils import AVLDataRecord
+from application.hub import Hub
+from application.spatial import GridIndex
+from application.storage import TelemetryStore
+from framework.utils import AVLDataRecord, LazyAVLDataRecord
 
 
-@dataclass
+@dataclass(slots=True)
 class Vehicle:
     """Data representation of a vehicle."""
 
@@ -24,5 +30,94 @@ class Vehicle:
         return None
 
 
-records: asyncio.Queue[AVLDataRecord] = asyncio.Queue(maxsize=300)
-vehicle = Vehicle()
+class Fleet:
+    """Latest state of every vehicle, keyed by IMEI.
+
+    State is stored in array columns; each IMEI is mapped to a slot (an
+    index into the columns). Slots of evicted vehicles are reused.
+    """
+
+    __slots__ = ("slots", "free", "lat", "lng", "altitude", "angle", "speed", "seen")
+
+    def __init__(self):
+        self.slots: dict[str, int] = {}
+        self.free: list[int] = []
+        self.lat = array("d")
+        self.lng = array("d")
+        self.altitude = array("h")
+        self.angle = array("H")
+        self.speed = array("H")
+        # time.monotonic() of the last update.
+        self.seen = array("d")
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def __contains__(self, imei: str) -> bool:
+        return imei in self.slots
+
+    def _allocate(self, imei: str) -> int:
+        if self.free:
+            slot = self.free.pop()
+        else:
+            slot = len(self.seen)
+            for column in (self.lat, self.lng, self.seen):
+                column.append(math.nan)
+            for column in (self.altitude, self.angle, self.speed):
+                column.append(0)
+        self.slots[imei] = slot
+        return slot
+
+    def update(self, imei: str, record: AVLDataRecord | LazyAVLDataRecord) -> int:
+        """Store the state reported in record and return the vehicle slot."""
+        slot = self.slots.get(imei)
+        if slot is None:
+            slot = self._allocate(imei)
+        self.lat[slot] = record.latitude
+        self.lng[slot] = record.longitude
+        self.altitude[slot] = record.altitude
+        self.angle[slot] = record.angle
+        self.speed[slot] = record.speed
+        self.seen[slot] = time.monotonic()
+        return slot
+
+    def get(self, imei: str) -> Vehicle | None:
+        """Return a copy of the vehicle state, None for unknown IMEIs."""
+        slot = self.slots.get(imei)
+        if slot is None:
+            return None
+        return Vehicle(
+            self.lat[slot],
+            self.lng[slot],
+            self.altitude[slot],
+            self.angle[slot],
+            self.speed[slot],
+        )
+
+    def positions(self) -> Iterator[tuple[str, float, float]]:
+        """Iterate over (imei, lat, lng) of every vehicle."""
+        lat, lng = self.lat, self.lng
+        for imei, slot in list(self.slots.items()):
+            yield imei, lat[slot], lng[slot]
+
+    def evict(self, max_age: float) -> list[str]:
+        """Remove vehicles not updated in max_age seconds, return their IMEIs."""
+        deadline = time.monotonic() - max_age
+        seen = self.seen
+        stale = [imei for imei, slot in self.slots.items() if seen[slot] < deadline]
+        for imei in stale:
+            slot = self.slots.pop(imei)
+            self.lat[slot] = self.lng[slot] = math.nan
+            self.free.append(slot)
+        return stale
+
+
+DATABASE = "telemetry.db"
+
+# Vehicles not reporting for this many seconds are removed from the fleet.
+STALE_AFTER = 15 * 60
+
+fleet = Fleet()
+grid = GridIndex()
+hub = Hub()
+store = TelemetryStore(DATABASE)
@@ -0,0 +1,138 @@
+"""Broadcast hub for live telemetry."""
+
+import asyncio
+from collections import deque
+from collections.abc import Iterable
+
+from framework.utils import AVLDataRecord, LazyAVLDataRecord
+
+Record = AVLDataRecord | LazyAVLDataRecord
+
+
+class Subscription:
+    """Bounded buffer of published records, dropping the oldest when full."""
+
+    def __init__(self, hub: "Hub", maxsize: int, imeis: Iterable[str] | None):
+        self.hub = hub
+        self.imeis = frozenset(imeis) if imeis is not None else None
+        self.dropped = 0
+        self._items: deque[tuple[str, Record]] = deque(maxlen=maxsize)
+        self._ready = asyncio.Event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> tuple[str, Record]:
+        return await self.get()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def put(self, imei: str, record: Record):
+        """Buffer a record; never blocks."""
+        items = self._items
+        if len(items) == items.maxlen:
+            self.dropped += 1
+        items.append((imei, record))
+        self._ready.set()
+
+    def drain(self) -> list[tuple[str, Record]]:
+        """Return and remove all buffered (imei, record) pairs."""
+        items = list(self._items)
+        self._items.clear()
+        self._ready.clear()
+        return items
+
+    async def get(self) -> tuple[str, Record]:
+        """Wait for and return the oldest buffered (imei, record) pair."""
+        await self.wait()
+        return self._items.popleft()
+
+    async def wait(self):
+        """Wait until at least one record is buffered."""
+        while not len(self):
+            self._ready.clear()
+            await self._ready.wait()
+
+    def close(self):
+        """Stop receiving records."""
+        self.hub.unsubscribe(self)
+
+
+class LatestSubscription(Subscription):
+    """Buffer keeping only the latest record of each vehicle."""
+
+    def __init__(self, hub: "Hub", maxsize: int, imeis: Iterable[str] | None):
+        super().__init__(hub, maxsize, imeis)
+        self.maxsize = maxsize
+        self._latest: dict[str, Record] = {}
+
+    def __len__(self) -> int:
+        return len(self._latest)
+
+    def put(self, imei: str, record: Record):
+        latest = self._latest
+        if latest.pop(imei, None) is not None:
+            self.dropped += 1
+        elif len(latest) == self.maxsize:
+            del latest[next(iter(latest))]
+            self.dropped += 1
+        latest[imei] = record
+        self._ready.set()
+
+    def drain(self) -> list[tuple[str, Record]]:
+        items = list(self._latest.items())
+        self._latest.clear()
+        self._ready.clear()
+        return items
+
+    async def get(self) -> tuple[str, Record]:
+        await self.wait()
+        imei = next(iter(self._latest))
+        return imei, self._latest.pop(imei)
+
+
+POLICIES = {"drop_oldest": Subscription, "latest": LatestSubscription}
+
+
+class Hub:
+    """Fan out published records to every subscriber without blocking.
+
+    Each subscriber has its own bounded buffer, so a slow subscriber only
+    loses its own records and never slows down the publisher.
+    """
+
+    def __init__(self):
+        self.subscribers: set[Subscription] = set()
+
+    def publish(self, imei: str, record: Record):
+        """Deliver a record of a vehicle to all interested subscribers."""
+        for subscriber in self.subscribers:
+            if subscriber.imeis is None or imei in subscriber.imeis:
+                subscriber.put(imei, record)
+
+    def subscribe(
+        self,
+        maxsize: int = 300,
+        policy: str = "drop_oldest",
+        imeis: Iterable[str] | None = None,
+    ) -> Subscription:
+        """Subscribe to records, optionally only of the given IMEIs.
+
+        policy is "drop_oldest" to keep the last maxsize records, or
+        "latest" to keep only the latest record of up to maxsize vehicles.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy {policy!r}")
+        subscription = POLICIES[policy](self, maxsize, imeis)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscribers.discard(subscription)
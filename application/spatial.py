@@ -0,0 +1,158 @@
+"""Grid spatial index of live vehicle positions."""
+
+import math
+from collections.abc import Iterator
+
+from application.track import METERS_PER_DEGREE, distance
+
+# Side of a grid cell in degrees.
+CELL_SIZE = 0.05
+# Approximate size of a cluster on screen in pixels (a map tile has 256).
+CLUSTER_PIXELS = 80
+
+Position = tuple[str, float, float]
+Cluster = tuple[float, float, int]
+
+
+class Cell:
+    """Vehicles in one grid cell and the sum of their coordinates."""
+
+    __slots__ = ("members", "lat_sum", "lng_sum")
+
+    def __init__(self):
+        self.members: dict[str, tuple[float, float]] = {}
+        self.lat_sum = 0.0
+        self.lng_sum = 0.0
+
+
+class GridIndex:
+    """Positions of vehicles bucketed into a uniform lat/lng grid.
+
+    Updates are O(1). Bounding box queries visit only the cells
+    overlapping the box. Boxes crossing the antimeridian are not
+    supported.
+    """
+
+    def __init__(self, cell_size: float = CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int, int], Cell] = {}
+        self.cell_of: dict[str, tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.cell_of)
+
+    def _key(self, lat: float, lng: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell_size), math.floor(lng / self.cell_size)
+
+    def update(self, imei: str, lat: float, lng: float):
+        """Set the position of a vehicle."""
+        key = self._key(lat, lng)
+        old_key = self.cell_of.get(imei)
+        if old_key == key:
+            cell = self.cells[key]
+            old_lat, old_lng = cell.members[imei]
+            cell.lat_sum += lat - old_lat
+            cell.lng_sum += lng - old_lng
+            cell.members[imei] = (lat, lng)
+            return
+        if old_key is not None:
+            self._discard(imei, old_key)
+        cell = self.cells.get(key)
+        if cell is None:
+            cell = self.cells[key] = Cell()
+        cell.members[imei] = (lat, lng)
+        cell.lat_sum += lat
+        cell.lng_sum += lng
+        self.cell_of[imei] = key
+
+    def remove(self, imei: str):
+        """Remove a vehicle, if present."""
+        key = self.cell_of.pop(imei, None)
+        if key is not None:
+            self._discard(imei, key)
+
+    def _discard(self, imei: str, key: tuple[int, int]):
+        cell = self.cells[key]
+        lat, lng = cell.members.pop(imei)
+        if not cell.members:
+            del self.cells[key]
+        else:
+            cell.lat_sum -= lat
+            cell.lng_sum -= lng
+
+    def _cells(
+        self, south: float, west: float, north: float, east: float
+    ) -> Iterator[tuple[tuple[int, int], Cell]]:
+        """Cells overlapping the bounding box."""
+        row_min, col_min = self._key(south, west)
+        row_max, col_max = self._key(north, east)
+        cells = self.cells
+        if (row_max - row_min + 1) * (col_max - col_min + 1) > len(cells):
+            # Fewer occupied cells than cells in the box.
+            for key, cell in list(cells.items()):
+                row, col = key
+                if row_min <= row <= row_max and col_min <= col <= col_max:
+                    yield key, cell
+            return
+        for row in range(row_min, row_max + 1):
+            for col in range(col_min, col_max + 1):
+                cell = cells.get((row, col))
+                if cell is not None:
+                    yield (row, col), cell
+
+    def bbox(
+        self, south: float, west: float, north: float, east: float
+    ) -> list[Position]:
+        """Vehicles inside the bounding box as (imei, lat, lng)."""
+        return [
+            (imei, lat, lng)
+            for _, cell in self._cells(south, west, north, east)
+            for imei, (lat, lng) in cell.members.items()
+            if south <= lat <= north and west <= lng <= east
+        ]
+
+    def count(self, south: float, west: float, north: float, east: float) -> int:
+        """Approximate number of vehicles in the box, counted per whole cell."""
+        return sum(
+            len(cell.members) for _, cell in self._cells(south, west, north, east)
+        )
+
+    def radius(self, lat: float, lng: float, meters: float) -> list[Position]:
+        """Vehicles within meters of a point as (imei, lat, lng)."""
+        dlat = meters / METERS_PER_DEGREE
+        dlng = dlat / max(math.cos(math.radians(lat)), 1e-6)
+        center = (lat, lng)
+        return [
+            position
+            for position in self.bbox(lat - dlat, lng - dlng, lat + dlat, lng + dlng)
+            if distance(center, position[1:]) <= meters
+        ]
+
+    def clusters(
+        self, south: float, west: float, north: float, east: float, zoom: int
+    ) -> list[Cluster]:
+        """Vehicles in the box grouped for a map zoom level.
+
+        Returns (lat, lng, count) of each group, located at the mean
+        position of its vehicles. Groups are built from whole grid cells,
+        so they are never smaller than a cell.
+        """
+        size = 360 / 2**zoom * CLUSTER_PIXELS / 256
+        ratio = max(1, round(size / self.cell_size))
+        groups: dict[tuple[int, int], list] = {}
+        for (row, col), cell in self._cells(south, west, north, east):
+            group = groups.get((row // ratio, col // ratio))
+            if group is None:
+                groups[row // ratio, col // ratio] = [
+                    cell.lat_sum,
+                    cell.lng_sum,
+                    len(cell.members),
+                ]
+            else:
+                group[0] += cell.lat_sum
+                group[1] += cell.lng_sum
+                group[2] += len(cell.members)
+        return [
+            (lat_sum / count, lng_sum / count, count)
+            for lat_sum, lng_sum, count in groups.values()
+        ]
@@ -0,0 +1,176 @@
+"""Write-behind telemetry store."""
+
+import asyncio
+import contextlib
+import logging
+import sqlite3
+from collections import deque
+
+from framework.utils import LazyAVLDataRecord
+
+LOGGER = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    imei TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    altitude INTEGER NOT NULL,
+    angle INTEGER NOT NULL,
+    satellites INTEGER NOT NULL,
+    speed INTEGER NOT NULL,
+    PRIMARY KEY (imei, timestamp)
+) WITHOUT ROWID
+"""
+
+INSERT = "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+
+HISTORY_FIELDS = (
+    "timestamp",
+    "latitude",
+    "longitude",
+    "altitude",
+    "angle",
+    "satellites",
+    "speed",
+)
+HISTORY = f"""
+SELECT {", ".join(HISTORY_FIELDS)}
+FROM records
+WHERE imei = ? AND timestamp >= ? AND timestamp < ?
+ORDER BY timestamp
+LIMIT ?
+"""
+
+Row = tuple[str, int, float, float, int, int, int, int]
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Open the database in WAL mode, creating the schema if needed."""
+    db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute(SCHEMA)
+    return db
+
+
+class TelemetryStore:
+    """SQLite store of AVL records written behind the event loop.
+
+    Records are buffered in memory by `add` and inserted in large batches
+    from a worker thread, at least every flush_interval seconds. When the
+    buffer holds max_pending records, the oldest ones are dropped.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = 10_000,
+        flush_interval: float = 1.0,
+        max_pending: int = 1_000_000,
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending: deque[Row] = deque(maxlen=max_pending)
+        self.dropped = 0
+        self._db: sqlite3.Connection | None = None
+        self._ready = asyncio.Event()
+        self._closing = False
+        self._writer: asyncio.Task | None = None
+
+    def add(self, imei: str, record: LazyAVLDataRecord):
+        """Queue a record for writing; never blocks."""
+        pending = self.pending
+        if len(pending) == pending.maxlen:
+            self.dropped += 1
+        pending.append(
+            (
+                imei,
+                record.timestamp_ms,
+                record.latitude,
+                record.longitude,
+                record.altitude,
+                record.angle,
+                record.satellites,
+                record.speed,
+            )
+        )
+        if len(pending) >= self.batch_size:
+            self._ready.set()
+
+    async def start(self):
+        self._db = await asyncio.to_thread(connect, self.path)
+        self._writer = asyncio.create_task(self._write_behind())
+
+    async def close(self):
+        """Write all pending records and close the database."""
+        if self._writer is None:
+            return
+        self._closing = True
+        self._ready.set()
+        await self._writer
+        await asyncio.to_thread(self._db.close)
+        self._writer = self._db = None
+
+    async def flush(self):
+        """Write all pending records.
+
+        Records of a batch that fails to write are put back in front of
+        the queue and written on the next flush.
+        """
+        while self.pending:
+            rows = self._take()
+            try:
+                await asyncio.to_thread(self._write, rows)
+            except sqlite3.Error:
+                self._put_back(rows)
+                raise
+
+    def _take(self) -> list[Row]:
+        pending = self.pending
+        return [pending.popleft() for _ in range(min(len(pending), self.batch_size))]
+
+    def _put_back(self, rows: list[Row]):
+        pending = self.pending
+        # Records added meanwhile may have filled the buffer; the oldest
+        # ones are dropped, as in add().
+        overflow = len(pending) + len(rows) - pending.maxlen
+        if overflow > 0:
+            self.dropped += overflow
+            rows = rows[overflow:]
+        pending.extendleft(reversed(rows))
+
+    def _write(self, rows: list[Row]):
+        with self._db:
+            self._db.executemany(INSERT, rows)
+
+    async def _write_behind(self):
+        while True:
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(self._ready.wait(), self.flush_interval)
+            self._ready.clear()
+            closing = self._closing
+            try:
+                await self.flush()
+            except sqlite3.Error:
+                LOGGER.exception("Failed to write records")
+            if closing:
+                return
+
+    async def history(
+        self, imei: str, start_ms: int, end_ms: int, limit: int = 10_000
+    ) -> list[tuple[int, float, float, int, int, int, int]]:
+        """Records of a vehicle with start_ms <= timestamp < end_ms."""
+        return await asyncio.to_thread(self._history, imei, start_ms, end_ms, limit)
+
+    def _history(self, imei: str, start_ms: int, end_ms: int, limit: int):
+        # WAL allows readers next to the writer, so each query opens its own
+        # connection instead of waiting for the writer thread. connect()
+        # creates the schema for HTTP-only processes that never wrote.
+        db = connect(self.path)
+        try:
+            return db.execute(HISTORY, (imei, start_ms, end_ms, limit)).fetchall()
+        finally:
+            db.close()
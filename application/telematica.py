@@ -1,26 +1,70 @@
 """ASGI application (TCP) for telemetry."""
 
+import asyncio
+import contextlib
+import os
+
+from framework.auth import CachedAuthenticator, SQLiteAuthenticator
+from framework.dedup import Deduplicator
 from framework.main import Telematica
-from framework.utils import AVLData, AVLDataResponse, Login
+from framework.utils import AVLDataResponse, Connection, LazyAVLData, Login
 
-from application.data import vehicle, records
+from application.bus import BusWriter, segment_name
+from application.data import DATABASE, STALE_AFTER, fleet, grid, hub, store
 
 app = Telematica()
 
 KNOWN_VEHICLES = ["123456789012345"]
 
+registry = SQLiteAuthenticator(DATABASE)
+registry.add(*KNOWN_VEHICLES)
+
+_evict_task: asyncio.Task | None = None
+# Positions for the web process when running in a TCP worker process.
+_bus: BusWriter | None = None
+
+
+async def evict_stale_vehicles():
+    while True:
+        await asyncio.sleep(STALE_AFTER / 10)
+        for imei in fleet.evict(STALE_AFTER):
+            grid.remove(imei)
+
+
+@app.on_startup()
+async def startup():
+    global _evict_task, _bus
+    if "WORKER_INDEX" in os.environ:
+        _bus = BusWriter(segment_name(int(os.environ["WORKER_INDEX"])))
+    await store.start()
+    _evict_task = asyncio.create_task(evict_stale_vehicles())
+
+
+@app.on_shutdown()
+async def shutdown():
+    if _evict_task is not None:
+        _evict_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _evict_task
+    await store.close()
+    if _bus is not None:
+        _bus.close()
+        _bus.unlink()
+
 
-@app.login()
+@app.login(authenticator=CachedAuthenticator(registry))
 async def login(login: Login):
-    """Handle incoming login packets."""
-    if login.imei not in KNOWN_VEHICLES:
-        raise ValueError("Invalid imei")
+    """Handle incoming login packets of registered vehicles."""
 
 
-@app.avl()
-async def avl(avldata: AVLData):
+@app.avl(lazy=True, dedup=Deduplicator())
+async def avl(avldata: LazyAVLData, connection: Connection):
     """Handle incoming data packets."""
     for record in avldata.records:
-        records.put_nowait(record)
-        vehicle.lat, vehicle.lng = record.latitude, record.longitude
+        fleet.update(connection.imei, record)
+        grid.update(connection.imei, record.latitude, record.longitude)
+        hub.publish(connection.imei, record)
+        store.add(connection.imei, record)
+        if _bus is not None:
+            _bus.publish(connection.imei, record)
     return AVLDataResponse(avldata.record_count)
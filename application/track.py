@@ -0,0 +1,97 @@
+"""Decimated vehicle tracks for the map."""
+
+import math
+
+# Points closer than this many meters to the previous point are skipped.
+MIN_DISTANCE = 10.0
+# Tracks longer than this are simplified.
+MAX_POINTS = 500
+
+METERS_PER_DEGREE = 111_320.0
+
+Point = tuple[float, float]
+
+
+def _project(points: list[Point]) -> list[tuple[float, float]]:
+    """Project (lat, lng) points to local planar coordinates in meters."""
+    scale = math.cos(math.radians(points[0][0]))
+    return [
+        (lng * METERS_PER_DEGREE * scale, lat * METERS_PER_DEGREE)
+        for lat, lng in points
+    ]
+
+
+def distance(a: Point, b: Point) -> float:
+    """Approximate distance in meters between two nearby (lat, lng) points."""
+    scale = math.cos(math.radians(a[0]))
+    dx = (b[1] - a[1]) * scale
+    dy = b[0] - a[0]
+    return math.hypot(dx, dy) * METERS_PER_DEGREE
+
+
+def simplify(points: list[Point], tolerance: float) -> list[Point]:
+    """Douglas-Peucker simplification with tolerance in meters."""
+    if len(points) < 3:
+        return list(points)
+    xy = _project(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (x1, y1), (x2, y2) = xy[first], xy[last]
+        dx, dy = x2 - x1, y2 - y1
+        length = math.hypot(dx, dy)
+        farthest, max_distance = 0, -1.0
+        for i in range(first + 1, last):
+            x, y = xy[i]
+            if length:
+                d = abs(dy * (x - x1) - dx * (y - y1)) / length
+            else:
+                d = math.hypot(x - x1, y - y1)
+            if d > max_distance:
+                farthest, max_distance = i, d
+        if max_distance > tolerance:
+            keep[farthest] = True
+            if farthest - first > 1:
+                stack.append((first, farthest))
+            if last - farthest > 1:
+                stack.append((farthest, last))
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+class Track:
+    """Polyline of a vehicle with a minimum point spacing and a point budget."""
+
+    __slots__ = ("points", "min_distance", "max_points", "tolerance")
+
+    def __init__(
+        self, min_distance: float = MIN_DISTANCE, max_points: int = MAX_POINTS
+    ):
+        self.points: list[Point] = []
+        self.min_distance = min_distance
+        self.max_points = max_points
+        self.tolerance = min_distance
+
+    def add(self, point: Point) -> bool:
+        """Append a point, return False if it was too close to the last one."""
+        if self.points and distance(self.points[-1], point) < self.min_distance:
+            return False
+        self.points.append(point)
+        return True
+
+    def over_budget(self) -> bool:
+        return len(self.points) > self.max_points
+
+    def simplify(self):
+        """Simplify the track to at most three quarters of the point budget.
+
+        The tolerance is doubled until the budget is met and kept for later
+        calls, so a long track is not simplified again after every point.
+        """
+        target = self.max_points * 3 // 4
+        points = simplify(self.points, self.tolerance)
+        while len(points) > target:
+            self.tolerance *= 2
+            points = simplify(points, self.tolerance)
+        self.points = points
@@ -1,10 +1,16 @@
 """ASGI application (HTTP) for UI."""
 
 import asyncio
+import time
 
-from nicegui import ui, APIRouter, App
+from fastapi.responses import PlainTextResponse
+from nicegui import ui, APIRouter, App, background_tasks
 
-from application.data import records, vehicle
+import metrics
+from application.bus import BusReader, attach_readers
+from application.data import STALE_AFTER, fleet, grid, hub, store
+from application.storage import HISTORY_FIELDS
+from application.track import Track
 
 app = App()
 router = APIRouter()
@@ -14,6 +20,19 @@ ui.card.default_classes("col text-center")
 ui.card.default_props("flat bordered")
 
 MAP_CENTER = (50.077019, 14.475541)
+TRACK_STYLE = {"color": "red", "weight": 3}
+CLUSTER_STYLE = {"radius": 12, "color": "blue"}
+
+# Records are drawn in batches every TICK seconds.
+TICK = 0.2
+SUBSCRIPTION_SIZE = 5000
+MAX_LOG_LINES = 200
+LOG_LINES_PER_TICK = 10
+# Vehicles in the viewport are shown in clusters above MAX_MARKERS.
+MAX_MARKERS = 300
+REFRESH_INTERVAL = 1.0
+# Ticks between looking for new bus segments of TCP worker processes.
+BUS_ATTACH_TICKS = 25
 
 
 @router.page("/")
@@ -30,36 +49,158 @@ async def index():
         with ui.row(align_items="stretch").classes("mb-4"):
             with ui.card(align_items="center"):
                 ui.label("Map").classes("text-h4")
+                online = ui.label().classes("text-h6")
+                ui.timer(1.0, lambda: online.set_text(f"{len(fleet)} vehicles"))
                 m = ui.leaflet(center=MAP_CENTER).classes("h-full container")
 
             with ui.card(align_items="center"):
                 ui.label("Live Logs").classes("text-h4")
-                logs = ui.log().classes("h-96 container justify-items-start")
-
-    async def track_vehicle():
-        _record = await records.get()
-        logs.push(_record.text)
-        marker = m.marker(latlng=vehicle.position)
-
-        while True:
-            record = await records.get()
-            logs.push(_record.text)
-            marker.move(vehicle.lat, vehicle.lng)
-
-            m.generic_layer(
-                name="polyline",
-                args=[
-                    [
-                        [_record.latitude, _record.longitude],
-                        [record.latitude, record.longitude],
-                    ],
-                    {"color": "red", "weight": 3},
-                ],
-            )
-            _record = record
-
-    asyncio.create_task(track_vehicle())
+                logs = ui.log(max_lines=MAX_LOG_LINES).classes(
+                    "h-96 container justify-items-start"
+                )
+
+    subscription = hub.subscribe(maxsize=SUBSCRIPTION_SIZE)
+    # IMEI -> (track, marker, polyline layer) of vehicles shown individually
+    vehicles = {}
+    cluster_layers = []
+    # Visible (south, west, north, east) box, None until the map is ready.
+    view = {"bounds": None, "clustered": False}
+
+    def visible(point: tuple[float, float]) -> bool:
+        south, west, north, east = view["bounds"]
+        return south <= point[0] <= north and west <= point[1] <= east
+
+    def show_vehicle(imei: str, point: tuple[float, float]):
+        marker = m.marker(latlng=point)
+        layer = m.generic_layer(name="polyline", args=[[point], TRACK_STYLE])
+        track = Track()
+        track.add(point)
+        vehicles[imei] = (track, marker, layer)
+
+    def hide_vehicle(imei: str):
+        _, marker, layer = vehicles.pop(imei)
+        m.remove_layer(marker)
+        m.remove_layer(layer)
+
+    def refresh():
+        """Show vehicles inside the viewport, clustered if there are too many."""
+        bounds = view["bounds"]
+        if bounds is None:
+            return
+        for layer in cluster_layers:
+            m.remove_layer(layer)
+        cluster_layers.clear()
+
+        view["clustered"] = grid.count(*bounds) > MAX_MARKERS
+        if view["clustered"]:
+            for imei in list(vehicles):
+                hide_vehicle(imei)
+            for lat, lng, count in grid.clusters(*bounds, m.zoom):
+                layer = m.generic_layer(
+                    name="circleMarker", args=[[lat, lng], CLUSTER_STYLE]
+                )
+                layer.run_method("bindTooltip", str(count), {"permanent": True})
+                cluster_layers.append(layer)
+            return
+
+        positions = {imei: (lat, lng) for imei, lat, lng in grid.bbox(*bounds)}
+        for imei in list(vehicles):
+            if imei not in positions:
+                hide_vehicle(imei)
+        for imei, point in positions.items():
+            if imei not in vehicles:
+                show_vehicle(imei, point)
+
+    async def viewport_changed():
+        bounds = await m.run_map_method("getBounds")
+        south_west, north_east = bounds["_southWest"], bounds["_northEast"]
+        view["bounds"] = (
+            south_west["lat"],
+            south_west["lng"],
+            north_east["lat"],
+            north_east["lng"],
+        )
+        refresh()
+
+    def flush():
+        """Draw records received since the last tick."""
+        items = subscription.drain()
+        for _, record in items[-LOG_LINES_PER_TICK:]:
+            logs.push(record.text)
+        if view["bounds"] is None or view["clustered"]:
+            return
+
+        added: dict[str, list] = {}
+        for imei, record in items:
+            point = (record.latitude, record.longitude)
+            if imei not in vehicles:
+                if visible(point):
+                    show_vehicle(imei, point)
+                continue
+            track = vehicles[imei][0]
+            if track.add(point):
+                added.setdefault(imei, []).append(point)
+
+        for imei, points in added.items():
+            track, marker, layer = vehicles[imei]
+            marker.move(*points[-1])
+            if track.over_budget():
+                track.simplify()
+                layer.run_method("setLatLngs", track.points)
+            else:
+                for point in points:
+                    layer.run_method("addLatLng", point)
+
+    m.on("init", viewport_changed)
+    m.on("map-moveend", viewport_changed)
+    ui.timer(TICK, flush)
+    ui.timer(REFRESH_INTERVAL, refresh)
+    ui.context.client.on_disconnect(subscription.close)
+
+
+async def read_bus():
+    """Feed positions from TCP worker processes into this process.
+
+    Does nothing while the TCP app runs in this process, as no bus
+    segments are written then.
+    """
+    readers: dict[str, BusReader] = {}
+    ticks = 0
+    while True:
+        if ticks % BUS_ATTACH_TICKS == 0:
+            oldest = (time.time() - STALE_AFTER) * 1000
+            for reader in attach_readers(readers):
+                for position in reader.latest():
+                    if position.timestamp_ms >= oldest:
+                        fleet.update(position.imei, position)
+                        grid.update(
+                            position.imei, position.latitude, position.longitude
+                        )
+            if readers:
+                for imei in fleet.evict(STALE_AFTER):
+                    grid.remove(imei)
+        for reader in readers.values():
+            for position in reader.poll():
+                fleet.update(position.imei, position)
+                grid.update(position.imei, position.latitude, position.longitude)
+                hub.publish(position.imei, position)
+        ticks += 1
+        await asyncio.sleep(TICK)
+
+
+@router.get("/metrics")
+async def prometheus_metrics():
+    """Ingest metrics in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/history/{imei}")
+async def history(imei: str, start: int, end: int, limit: int = 10_000):
+    """Track of a vehicle between start and end (Unix time in milliseconds)."""
+    rows = await store.history(imei, start, end, limit)
+    return [dict(zip(HISTORY_FIELDS, row)) for row in rows]
 
 
 app.include_router(router)
+app.on_startup(lambda: background_tasks.create(read_bus(), name="read_bus"))
 ui.run_with(app)
@@ -0,0 +1,114 @@
+"""Login authenticators."""
+
+import asyncio
+import contextlib
+import sqlite3
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+
+import metrics
+
+
+class Authenticator:
+    """Decides whether a device with an IMEI may log in."""
+
+    async def authenticate(self, imei: str) -> bool:
+        raise NotImplementedError
+
+
+class StaticAuthenticator(Authenticator):
+    """Allows a fixed set of IMEIs."""
+
+    def __init__(self, imeis: Iterable[str]):
+        self.imeis = frozenset(imeis)
+
+    async def authenticate(self, imei: str) -> bool:
+        return imei in self.imeis
+
+
+class SQLiteAuthenticator(Authenticator):
+    """Allows IMEIs listed in the vehicles table of an SQLite database."""
+
+    SCHEMA = "CREATE TABLE IF NOT EXISTS vehicles (imei TEXT PRIMARY KEY)"
+
+    def __init__(self, path: str):
+        self.path = path
+        with contextlib.closing(sqlite3.connect(path)) as db, db:
+            db.execute(self.SCHEMA)
+
+    async def authenticate(self, imei: str) -> bool:
+        return await asyncio.to_thread(self._lookup, imei)
+
+    def _lookup(self, imei: str) -> bool:
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            query = "SELECT 1 FROM vehicles WHERE imei = ?"
+            return db.execute(query, (imei,)).fetchone() is not None
+        finally:
+            db.close()
+
+    def add(self, *imeis: str):
+        """Allow IMEIs."""
+        with contextlib.closing(sqlite3.connect(self.path)) as db, db:
+            db.executemany(
+                "INSERT OR IGNORE INTO vehicles VALUES (?)", [(i,) for i in imeis]
+            )
+
+
+class CachedAuthenticator(Authenticator):
+    """TTL and LRU cache in front of another authenticator.
+
+    Rejections are cached too, for negative_ttl seconds. Concurrent
+    lookups of the same IMEI share one backend call. Backend errors are
+    not cached.
+    """
+
+    def __init__(
+        self,
+        backend: Authenticator,
+        ttl: float = 300.0,
+        negative_ttl: float = 30.0,
+        maxsize: int = 100_000,
+    ):
+        self.backend = backend
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.maxsize = maxsize
+        # IMEI -> (allowed, expiry as time.monotonic()), least recent first.
+        self._cache: OrderedDict[str, tuple[bool, float]] = OrderedDict()
+        self._pending: dict[str, asyncio.Task[bool]] = {}
+
+    async def authenticate(self, imei: str) -> bool:
+        entry = self._cache.get(imei)
+        if entry is not None and entry[1] > time.monotonic():
+            self._cache.move_to_end(imei)
+            if metrics.enabled:
+                metrics.AUTH_CACHE["hit"].inc()
+            return entry[0]
+
+        task = self._pending.get(imei)
+        if task is None:
+            if metrics.enabled:
+                metrics.AUTH_CACHE["miss"].inc()
+            task = self._pending[imei] = asyncio.create_task(self._lookup(imei))
+        elif metrics.enabled:
+            metrics.AUTH_CACHE["coalesced"].inc()
+        # A cancelled caller must not cancel the lookup shared with others.
+        return await asyncio.shield(task)
+
+    async def _lookup(self, imei: str) -> bool:
+        try:
+            allowed = await self.backend.authenticate(imei)
+        finally:
+            del self._pending[imei]
+        ttl = self.ttl if allowed else self.negative_ttl
+        self._cache[imei] = (allowed, time.monotonic() + ttl)
+        self._cache.move_to_end(imei)
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return allowed
+
+    def invalidate(self, imei: str):
+        """Forget the cached result of an IMEI."""
+        self._cache.pop(imei, None)
@@ -7,7 +7,7 @@ import struct
 class ByteReader:
     """Util to process protocol bytes."""
 
-    def __init__(self, data: bytes):
+    def __init__(self, data: bytes | memoryview):
         self.stream = io.BytesIO(data)
 
     def read(self, n: int) -> bytes:
@@ -0,0 +1,198 @@
+"""Deduplication of retransmitted AVL records.
+
+Devices resend the whole frame when an ack is lost. A Deduplicator
+remembers, per IMEI, the last frames and records that were handled,
+so retransmitted ones are acknowledged without reaching the handler
+again.
+"""
+
+import hashlib
+import struct
+import zlib
+from array import array
+from collections import OrderedDict
+from typing import NamedTuple
+
+import metrics
+from framework.utils import (
+    AVL_HEADER,
+    AVL_RECORD,
+    IO_GROUPS,
+    DecodeError,
+    decode_header,
+    skip_record,
+)
+
+# Timestamp and total IO count of a record.
+RECORD_KEY = struct.Struct(">Q17xB")
+# Size of records without IO elements: fields and four empty IO groups.
+RECORD_NO_IO = AVL_RECORD.size + len(IO_GROUPS)
+# Number of records repeated after the records of a packet.
+RECORD_COUNT = struct.Struct(">B")
+
+
+class Check(NamedTuple):
+    """Result of checking a packet for duplicates.
+
+    packet holds the records not seen before, or is None if there are
+    none. duplicates is the number of records dropped; batched of them
+    were found only in earlier packets of the same check_many() call.
+    """
+
+    packet: bytes | memoryview | None
+    duplicates: int
+    digest: int
+    records: list[tuple[int, int]]
+    batched: int = 0
+
+
+class _Vehicle:
+    """Recently handled frames and records of one IMEI."""
+
+    __slots__ = ("floor", "newest", "keys", "timestamps", "position", "frames", "frame")
+
+    def __init__(self, window: int, frames: int):
+        # Records at or before floor are older than anything in the window.
+        self.floor = 0
+        self.newest = 0
+        self.keys = array("q", bytes(8 * window))
+        self.timestamps = array("Q", bytes(8 * window))
+        self.position = 0
+        self.frames = array("Q", bytes(8 * frames))
+        self.frame = 0
+
+    def copy(self) -> "_Vehicle":
+        vehicle = _Vehicle.__new__(_Vehicle)
+        vehicle.floor, vehicle.newest = self.floor, self.newest
+        vehicle.keys, vehicle.timestamps = self.keys[:], self.timestamps[:]
+        vehicle.position = self.position
+        vehicle.frames, vehicle.frame = self.frames[:], self.frame
+        return vehicle
+
+
+class Deduplicator:
+    """Drops AVL frames and records already handled for an IMEI.
+
+    Records are identified by timestamp and a checksum of their bytes.
+    The last `window` records of each IMEI are kept; records at or
+    before the newest one that left the window (the watermark) are
+    treated as duplicates, as devices send records in time order. Whole
+    frames seen among the last `frames` are skipped without parsing.
+    State is kept for at most maxsize IMEIs, least recently used first
+    out, so memory per vehicle is fixed.
+    """
+
+    def __init__(self, window: int = 64, frames: int = 8, maxsize: int = 100_000):
+        self.window = window
+        self.max_frames = frames
+        self.maxsize = maxsize
+        self._vehicles: OrderedDict[str, _Vehicle] = OrderedDict()
+
+    def _vehicle(self, imei: str) -> _Vehicle:
+        vehicle = self._vehicles.get(imei)
+        if vehicle is None:
+            vehicle = self._vehicles[imei] = _Vehicle(self.window, self.max_frames)
+            if len(self._vehicles) > self.maxsize:
+                self._vehicles.popitem(last=False)
+        else:
+            self._vehicles.move_to_end(imei)
+        return vehicle
+
+    def check(self, imei: str, packet: bytes | memoryview) -> Check:
+        """Find duplicates in a packet, without remembering its records yet."""
+        return self._check(self._vehicle(imei), packet)
+
+    def check_many(self, imei: str, packets: list) -> list[Check]:
+        """Find duplicates in packets handled together, in order.
+
+        Each packet is also checked against the earlier ones, so a frame
+        resent within the same batch is dropped. Those duplicates are
+        counted in Check.batched, as they are handled only if the earlier
+        packets are. As with check(), nothing is remembered before commit().
+        """
+        vehicle = self._vehicle(imei)
+        scratch = vehicle.copy()
+        checks = []
+        for i, packet in enumerate(packets):
+            check = self._check(scratch, packet)
+            if i and check.duplicates:
+                known = self._check(vehicle, packet, metered=False).duplicates
+                check = check._replace(batched=check.duplicates - known)
+            self._remember(scratch, check)
+            checks.append(check)
+        return checks
+
+    def _check(
+        self, vehicle: _Vehicle, packet: bytes | memoryview, metered: bool = True
+    ) -> Check:
+        """Check a packet against the state of a vehicle.
+
+        With metered=False duplicates are not added to the metrics.
+        """
+        view = memoryview(packet)
+        codec, count = decode_header(view)
+        digest = int.from_bytes(hashlib.blake2b(view, digest_size=8).digest())
+        if digest in vehicle.frames:
+            if metered and metrics.enabled:
+                metrics.DUPLICATE_FRAMES.inc()
+                metrics.DUPLICATE_RECORDS.inc(count)
+            return Check(None, count, digest, [])
+
+        unpack_key = RECORD_KEY.unpack_from
+        crc32 = zlib.crc32
+        floor, newest, keys = vehicle.floor, vehicle.newest, vehicle.keys
+        records = []
+        fresh = []
+        offset = AVL_HEADER.size
+        try:
+            for _ in range(count):
+                timestamp, io_count = unpack_key(view, offset)
+                if io_count:
+                    end = skip_record(view, offset)
+                else:
+                    end = offset + RECORD_NO_IO
+                record = view[offset:end]
+                key = hash((timestamp, crc32(record)))
+                # Records newer than all handled ones need no lookup.
+                if timestamp > newest or (timestamp > floor and key not in keys):
+                    records.append((timestamp, key))
+                    fresh.append(record)
+                offset = end
+        except struct.error as exc:
+            raise DecodeError(f"Truncated AVL record at offset {offset}") from exc
+
+        duplicates = count - len(records)
+        if duplicates and metered and metrics.enabled:
+            metrics.DUPLICATE_RECORDS.inc(duplicates)
+        if not records:
+            return Check(None, count, digest, records)
+        if duplicates:
+            header = AVL_HEADER.pack(codec, len(records))
+            trailer = RECORD_COUNT.pack(len(records))
+            packet = b"".join((header, *fresh, trailer))
+        return Check(packet, duplicates, digest, records)
+
+    def commit(self, imei: str, check: Check):
+        """Remember the frame and records of a check once they were handled."""
+        self._remember(self._vehicle(imei), check)
+
+    def _remember(self, vehicle: _Vehicle, check: Check):
+        vehicle.frames[vehicle.frame] = check.digest
+        vehicle.frame = (vehicle.frame + 1) % self.max_frames
+        keys, timestamps, window = vehicle.keys, vehicle.timestamps, self.window
+        floor, newest, position = vehicle.floor, vehicle.newest, vehicle.position
+        for timestamp, key in check.records:
+            if timestamps[position] > floor:
+                floor = timestamps[position]
+            if timestamp > newest:
+                newest = timestamp
+            keys[position] = key
+            timestamps[position] = timestamp
+            position += 1
+            if position == window:
+                position = 0
+        vehicle.floor, vehicle.newest, vehicle.position = floor, newest, position
+
+    def forget(self, imei: str):
+        """Drop the state of an IMEI."""
+        self._vehicles.pop(imei, None)
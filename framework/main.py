@@ -1,6 +1,30 @@
 """Framework to build ASGI applications for Teltonika."""
 
-from framework.utils import AVLData, Login
+import asyncio
+import inspect
+import logging
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+import metrics
+from framework.auth import Authenticator
+from framework.dedup import Check, Deduplicator
+from framework.utils import AVLBatch, AVLData, Connection, LazyAVLData, Login
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _run_offloaded(decoder, handler, packet, *args):
+    """Decode a packet and run a synchronous handler, in an executor.
+
+    Returns the response, the record count and the decode time, for the
+    metrics kept by the event loop process.
+    """
+    started = time.perf_counter()
+    msg = decoder(packet)
+    decoded = time.perf_counter() - started
+    return handler(msg, *args), msg.record_count, decoded
 
 
 class Telematica:
@@ -8,46 +32,340 @@ class Telematica:
 
     def __init__(self):
         self.handlers = {}
+        self.decoders = {"login": Login.from_bytes, "avl": AVLData.from_bytes}
+        # Handlers that take the Connection as second argument.
+        self.with_connection: set[str] = set()
+        self.startup_handlers = []
+        self.shutdown_handlers = []
+        self.authenticator: Authenticator | None = None
+        self.deduplicators: dict[str, Deduplicator] = {}
+        self.executors: dict[str, Executor] = {}
 
     async def __call__(self, scope, receive, send):
         """Process and dispatch ASGI events to corresponding handlers."""
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+
         assert scope["type"] == "teltonika"
-        event = await receive()
+        # Scopes of the same TCP connection share the state dict, so the
+        # connection (and its IMEI) outlives a single event scope.
+        state = scope.get("state", {})
+        connection = state.get("connection")
+        if connection is None:
+            connection = state["connection"] = Connection(client=scope.get("client"))
 
+        if scope.get("lifecycle") != "connection":
+            await self._dispatch(await receive(), send, connection)
+            return
+
+        while True:
+            event = await receive()
+            if event["type"] == "teltonika.disconnect":
+                break
+            try:
+                await self._dispatch(event, send, connection)
+            except Exception:
+                LOGGER.exception("Exception in handler of %s", event["type"])
+
+    async def _dispatch(self, event, send, connection: Connection):
         match event.get("type"):
             case "teltonika.login":
-                msg = Login.from_bytes(event["data"])
+                msg = self.decoders["login"](event["data"])
                 try:
-                    await self.handlers["login"](msg)
+                    if self.authenticator is not None:
+                        if not await self.authenticator.authenticate(msg.imei):
+                            raise PermissionError(f"Unknown IMEI {msg.imei}")
+                    await self._call("login", msg, connection)
+                    connection.imei = msg.imei
                     await send({"type": "teltonika.login.accept"})
                 except Exception:
                     await send({"type": "teltonika.login.reject"})
 
             case "teltonika.avl":
-                msg = AVLData.from_bytes(event["data"])
-                processed_data = 0
+                processed = [0]
+                try:
+                    await self._process_avl([event["data"]], processed, connection)
+                finally:
+                    await send({"type": "teltonika.avl.accept", "data": processed[0]})
+
+            case "teltonika.avl.batch":
+                processed = [0] * len(event["data"])
                 try:
-                    resp = await self.handlers["avl"](msg)
-                    processed_data = resp.num
+                    await self._process_avl(event["data"], processed, connection)
                 finally:
-                    await send({"type": "teltonika.avl.accept", "data": processed_data})
+                    await send(
+                        {"type": "teltonika.avl.batch.accept", "data": processed}
+                    )
             case _:
-                raise Exception(f"unknown scope type: {scope}")
+                raise Exception(f"unknown event type: {event}")
+
+    async def _lifespan(self, receive, send):
+        """Run startup and shutdown handlers."""
+        while True:
+            event = await receive()
+            match event["type"]:
+                case "lifespan.startup":
+                    try:
+                        for handler in self.startup_handlers:
+                            await handler()
+                    except Exception as exc:
+                        await send(
+                            {"type": "lifespan.startup.failed", "message": str(exc)}
+                        )
+                        return
+                    await send({"type": "lifespan.startup.complete"})
+                case "lifespan.shutdown":
+                    try:
+                        for handler in self.shutdown_handlers:
+                            await handler()
+                        for executor in self.executors.values():
+                            await asyncio.to_thread(executor.shutdown)
+                    except Exception as exc:
+                        await send(
+                            {"type": "lifespan.shutdown.failed", "message": str(exc)}
+                        )
+                        return
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+
+    async def _call(self, name: str, msg, connection: Connection):
+        started = time.perf_counter() if metrics.enabled else None
+        try:
+            if name in self.with_connection:
+                return await self.handlers[name](msg, connection)
+            return await self.handlers[name](msg)
+        finally:
+            if started is not None:
+                metrics.STAGES["handler"].observe_since(started)
+
+    async def _process_avl(
+        self, packets: list, processed: list[int], connection: Connection
+    ):
+        """Run AVL handlers, storing processed record count of each packet.
+
+        A batch handler receives all packets at once, otherwise the AVL
+        handler is called for every packet. With a deduplicator, records
+        already handled, also earlier in the same batch, are dropped but
+        still counted as processed.
+        """
+        batch = "avl_batch" in self.handlers
+        dedup = self.deduplicators.get("avl_batch" if batch else "avl")
+        imei = connection.imei
+        if imei is None:
+            dedup = None
+
+        if batch:
+            checks: list[Check] = []
+            if dedup is not None:
+                checks = dedup.check_many(imei, packets)
+                packets = [check.packet for check in checks]
+            try:
+                await self._handle_avl_batch(packets, processed, connection)
+            finally:
+                # Copies of earlier packets count only if those were handled.
+                handled = True
+                for i, check in enumerate(checks):
+                    if check.batched and not handled:
+                        processed[i] = 0
+                        continue
+                    handled = handled and processed[i] == len(check.records)
+                    self._commit(dedup, imei, check, processed, i)
+            return
+
+        for i, packet in enumerate(packets):
+            # Checked and committed one by one, so a frame resent later in
+            # the same batch event is dropped.
+            check = dedup.check(imei, packet) if dedup is not None else None
+            if check is not None:
+                packet = check.packet
+            try:
+                if packet is not None:
+                    processed[i] = await self._handle_avl(packet, connection)
+            finally:
+                if check is not None:
+                    self._commit(dedup, imei, check, processed, i)
+
+    @staticmethod
+    def _commit(
+        dedup: Deduplicator, imei: str, check: Check, processed: list[int], i: int
+    ):
+        # Records are remembered only once the handler took all of them.
+        if processed[i] == len(check.records):
+            dedup.commit(imei, check)
+        processed[i] += check.duplicates
+
+    async def _handle_avl_batch(
+        self, packets: list, processed: list[int], connection: Connection
+    ):
+        """Run the batch handler for packets that are not None."""
+        pending = [i for i, packet in enumerate(packets) if packet is not None]
+        if not pending:
+            return
+        msgs = [self._decode("avl_batch", packets[i]) for i in pending]
+        resps = await self._call("avl_batch", msgs, connection)
+        if len(resps) != len(msgs):
+            raise ValueError("Batch handler must return a response per packet")
+        for i, resp in zip(pending, resps):
+            processed[i] = resp.num
+
+    async def _handle_avl(self, packet, connection: Connection) -> int:
+        """Run the AVL handler, return the number of records it processed."""
+        executor = self.executors.get("avl")
+        if executor is not None:
+            resp = await self._offload(executor, "avl", packet, connection)
+        else:
+            msg = self._decode("avl", packet)
+            resp = await self._call("avl", msg, connection)
+        return resp.num
+
+    async def _offload(self, executor: Executor, name: str, packet, connection):
+        """Decode and handle a packet in an executor, without blocking the loop."""
+        started = time.perf_counter() if metrics.enabled else None
+        if isinstance(executor, ProcessPoolExecutor):
+            # Memoryviews can not be pickled; this is the only copy made.
+            packet = bytes(packet)
+        args = (connection,) if name in self.with_connection else ()
+        decoded = 0.0
+        try:
+            resp, records, decoded = await asyncio.get_running_loop().run_in_executor(
+                executor,
+                _run_offloaded,
+                self.decoders[name],
+                self.handlers[name],
+                packet,
+                *args,
+            )
+        finally:
+            if started is not None:
+                elapsed = time.perf_counter() - started
+                metrics.STAGES["handler"].observe(elapsed - decoded)
+        if started is not None:
+            metrics.STAGES["decode"].observe(decoded)
+            metrics.RECORDS.inc(records)
+        return resp
+
+    def _decode(self, name: str, packet):
+        if not metrics.enabled:
+            return self.decoders[name](packet)
+        started = time.perf_counter()
+        msg = self.decoders[name](packet)
+        metrics.STAGES["decode"].observe_since(started)
+        metrics.RECORDS.inc(msg.record_count)
+        return msg
+
+    def _set_deduplicator(self, name: str, dedup: Deduplicator | None):
+        if dedup is not None:
+            self.deduplicators[name] = dedup
+        else:
+            self.deduplicators.pop(name, None)
+
+    def _register(self, name: str, func):
+        self.handlers[name] = func
+        if len(inspect.signature(func).parameters) > 1:
+            self.with_connection.add(name)
+        else:
+            self.with_connection.discard(name)
 
-    def login(self):
-        """Decorator that registers a handler for Login type"""
+    def on_startup(self):
+        """Decorator that registers a handler run on application startup"""
 
         def decorator(func):
-            self.handlers["login"] = func
+            self.startup_handlers.append(func)
             return func
 
         return decorator
 
-    def avl(self):
-        """Decorator that registers a handler for AVL type"""
+    def on_shutdown(self):
+        """Decorator that registers a handler run on application shutdown"""
+
+        def decorator(func):
+            self.shutdown_handlers.append(func)
+            return func
+
+        return decorator
+
+    def login(self, authenticator: Authenticator | None = None):
+        """Decorator that registers a handler for Login type
+
+        With an authenticator, logins of IMEIs it does not allow are
+        rejected before the handler is called.
+        """
+
+        def decorator(func):
+            self._register("login", func)
+            self.authenticator = authenticator
+            return func
+
+        return decorator
+
+    def avl(
+        self,
+        lazy: bool = False,
+        columnar: bool = False,
+        executor: str | Executor | None = None,
+        max_workers: int | None = None,
+        dedup: Deduplicator | None = None,
+    ):
+        """Decorator that registers a handler for AVL type
+
+        With lazy=True the handler receives LazyAVLData, whose record
+        fields are decoded only when accessed. With columnar=True it
+        receives an AVLBatch of NumPy arrays (requires numpy).
+
+        With executor="thread" or "process" (or an Executor), decoding and
+        the handler run in a pool of at most max_workers workers, so the
+        handler must be a regular function. Process pool handlers must be
+        importable module-level functions and receive a copy of the
+        connection.
+
+        With a Deduplicator, records retransmitted by a device are
+        acknowledged without calling the handler again.
+        """
+        if lazy and columnar:
+            raise ValueError("lazy and columnar decoding are mutually exclusive")
+        if executor == "thread":
+            executor = ThreadPoolExecutor(max_workers, thread_name_prefix="avl")
+        elif executor == "process":
+            executor = ProcessPoolExecutor(
+                max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        elif isinstance(executor, str):
+            raise ValueError(f"Unknown executor {executor!r}")
+
+        def decorator(func):
+            if executor is not None:
+                if inspect.iscoroutinefunction(func):
+                    raise TypeError("Handlers run in an executor can not be async")
+                self.executors["avl"] = executor
+            else:
+                self.executors.pop("avl", None)
+            self._register("avl", func)
+            self._set_deduplicator("avl", dedup)
+            if columnar:
+                self.decoders["avl"] = AVLBatch.from_bytes
+            elif lazy:
+                self.decoders["avl"] = LazyAVLData.from_bytes
+            else:
+                self.decoders["avl"] = AVLData.from_bytes
+            return func
+
+        return decorator
+
+    def avl_batch(self, lazy: bool = False, dedup: Deduplicator | None = None):
+        """Decorator that registers a handler for batches of AVL packets
+
+        The handler receives a list of AVLData (LazyAVLData with
+        lazy=True) and returns an AVLDataResponse for each of them.
+        Packets whose records were all dropped by dedup are left out.
+        """
 
         def decorator(func):
-            self.handlers["avl"] = func
+            self._register("avl_batch", func)
+            self._set_deduplicator("avl_batch", dedup)
+            self.decoders["avl_batch"] = (
+                LazyAVLData.from_bytes if lazy else AVLData.from_bytes
+            )
             return func
 
         return decorator
@@ -8,11 +8,28 @@ This way, target applications can focus purely on the
 application business logic.
 """
 
-from dataclasses import dataclass
+import struct
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any, Self
+from functools import cache
+from typing import TYPE_CHECKING, Any, Iterable, Self
 
-from framework.byte_reader import ByteReader
+if TYPE_CHECKING:
+    import numpy
+
+
+@dataclass(slots=True)
+class Connection:
+    """Device connection context.
+
+    Passed to handlers that accept a second argument. In connection
+    scope the same object is used for all frames of a connection, so
+    handlers can keep per-connection state in it.
+    """
+
+    client: tuple[str, int] | None = None
+    imei: str | None = None
+    state: dict[str, Any] = field(default_factory=dict)
 
 
 @dataclass
@@ -22,11 +39,69 @@ class Login:
     imei: str
 
     @classmethod
-    def from_bytes(cls, b: bytearray) -> Self:
-        return cls(imei=b.decode())
+    def from_bytes(cls, b: bytes | memoryview) -> Self:
+        return cls(imei=str(b, "utf-8"))
 
 
-@dataclass
+class DecodeError(ValueError):
+    """Malformed or truncated Teltonika data packet."""
+
+
+# Codec 8 layout: codec id, number of records.
+AVL_HEADER = struct.Struct(">BB")
+# Timestamp, priority, longitude, latitude, altitude, angle, satellites,
+# speed, event IO id, total IO count.
+AVL_RECORD = struct.Struct(">QBiihhBHBB")
+IO_COUNT = struct.Struct(">B")
+# IO elements are grouped by value size: (io_type, element struct).
+IO_GROUPS = (
+    (0x01, struct.Struct(">BB")),  # 1 byte
+    (0x02, struct.Struct(">BH")),  # 2 bytes
+    (0x03, struct.Struct(">BI")),  # 4 bytes
+    (0x04, struct.Struct(">BQ")),  # 8 bytes
+)
+CODEC_8 = 0x08
+
+
+def decode_io_elements(
+    buf: memoryview, offset: int
+) -> tuple[list[dict[str, Any]], int]:
+    """Decode IO element groups at offset, return them with the end offset."""
+    io_elements = []
+    try:
+        for io_type, element in IO_GROUPS:
+            (count,) = IO_COUNT.unpack_from(buf, offset)
+            offset += IO_COUNT.size
+            for _ in range(count):
+                io_id, io_value = element.unpack_from(buf, offset)
+                offset += element.size
+                io_elements.append(
+                    {
+                        "io_id": io_id,
+                        "io_type": io_type,
+                        "io_value": io_value,
+                    }
+                )
+    except struct.error as exc:
+        raise DecodeError(f"Truncated IO elements at offset {offset}") from exc
+    return io_elements, offset
+
+
+def skip_record(buf: memoryview, offset: int) -> int:
+    """Return the offset past the record at offset without decoding it."""
+    offset += AVL_RECORD.size
+    try:
+        for _, element in IO_GROUPS:
+            (count,) = IO_COUNT.unpack_from(buf, offset)
+            offset += IO_COUNT.size + count * element.size
+    except struct.error as exc:
+        raise DecodeError(f"Truncated AVL record at offset {offset}") from exc
+    if offset > len(buf):
+        raise DecodeError(f"Truncated AVL record at offset {offset}")
+    return offset
+
+
+@dataclass(slots=True)
 class AVLDataRecord:
     """Teltonika data record."""
 
@@ -43,47 +118,35 @@ class AVLDataRecord:
     io_elements: list[dict[str, Any]]
 
     @classmethod
-    def from_stream(cls, stream: ByteReader) -> "AVLDataRecord":
-        ts = stream.read_u64()
-        timestamp = datetime.fromtimestamp(ts / 1000).isoformat()
-
-        priority = stream.read_u8()
-        longitude = stream.read_i32() / 10_000_000
-        latitude = stream.read_i32() / 10_000_000
-        altitude = stream.read_i16()
-        angle = stream.read_i16()
-        satellites = stream.read_u8()
-        speed = stream.read_u16()
-        event_id = stream.read_u8()
-        total_io = stream.read_u8()
-
-        io_elements = []
-        for _ in range(total_io):
-            io_id = stream.read_u8()
-            io_type = stream.read_u8()
-
-            if io_type == 0x01:  # Digital (1 byte)
-                io_value = stream.read_u8()
-            elif io_type == 0x02:  # Analog (2 bytes)
-                io_value = stream.read_u16()
-            elif io_type == 0x03:  # Extended (4 bytes)
-                io_value = stream.read_u32()
-            else:
-                io_value = None  # или raise ValueError
-
-            io_elements.append(
-                {
-                    "io_id": io_id,
-                    "io_type": io_type,
-                    "io_value": io_value,
-                }
+    def from_buffer(cls, buf: memoryview, offset: int) -> tuple[Self, int]:
+        """Decode a record at offset, return it with the offset past its end."""
+        try:
+            (
+                ts,
+                priority,
+                longitude,
+                latitude,
+                altitude,
+                angle,
+                satellites,
+                speed,
+                event_id,
+                total_io,
+            ) = AVL_RECORD.unpack_from(buf, offset)
+        except struct.error as exc:
+            raise DecodeError(f"Truncated AVL record at offset {offset}") from exc
+        io_elements, offset = decode_io_elements(buf, offset + AVL_RECORD.size)
+
+        if len(io_elements) != total_io:
+            raise DecodeError(
+                f"IO element count mismatch: {len(io_elements)} != {total_io}"
             )
 
-        return cls(
-            timestamp=timestamp,
+        record = cls(
+            timestamp=datetime.fromtimestamp(ts / 1000).isoformat(),
             priority=priority,
-            latitude=latitude,
-            longitude=longitude,
+            latitude=latitude / 10_000_000,
+            longitude=longitude / 10_000_000,
             altitude=altitude,
             angle=angle,
             satellites=satellites,
@@ -92,6 +155,7 @@ class AVLDataRecord:
             io_element_count=total_io,
             io_elements=io_elements,
         )
+        return record, offset
 
     @property
     def text(self) -> str:
@@ -99,7 +163,7 @@ class AVLDataRecord:
         return f"{self.timestamp}: Lat: {self.latitude}, Lon: {self.longitude}, speed: {self.speed}"
 
 
-@dataclass
+@dataclass(slots=True)
 class AVLData:
     """Teltonika data packet."""
 
@@ -108,14 +172,288 @@ class AVLData:
     records: list[AVLDataRecord]
 
     @classmethod
-    def from_bytes(cls, b: bytearray) -> Self:
-        stream = ByteReader(b)
-        codec = stream.read_u8()
-        record_count = stream.read_u8()
-        records = [AVLDataRecord.from_stream(stream) for _ in range(record_count)]
+    def from_bytes(cls, b: bytes | memoryview) -> Self:
+        buf = memoryview(b)
+        codec, record_count = decode_header(buf)
+        offset = AVL_HEADER.size
+        records = []
+        for _ in range(record_count):
+            record, offset = AVLDataRecord.from_buffer(buf, offset)
+            records.append(record)
         return cls(codec=codec, record_count=record_count, records=records)
 
 
+def decode_header(buf: memoryview) -> tuple[int, int]:
+    """Decode and validate codec id and number of records."""
+    try:
+        codec, record_count = AVL_HEADER.unpack_from(buf, 0)
+    except struct.error as exc:
+        raise DecodeError("Truncated AVL data header") from exc
+    if codec != CODEC_8:
+        raise DecodeError(f"Unsupported codec: {codec:#04x}")
+    return codec, record_count
+
+
+class LazyAVLDataRecord:
+    """Teltonika data record decoded on first access.
+
+    Keeps a reference to the packet bytes and the record offset. The
+    fixed fields are unpacked together on first access, IO elements
+    only when requested.
+    """
+
+    __slots__ = ("_buf", "_offset", "_fields", "_io_elements")
+
+    def __init__(self, buf: bytes, offset: int):
+        self._buf = buf
+        self._offset = offset
+        self._fields: tuple[int, ...] | None = None
+        self._io_elements: list[dict[str, Any]] | None = None
+
+    def _unpack(self) -> tuple[int, ...]:
+        if self._fields is None:
+            self._fields = AVL_RECORD.unpack_from(self._buf, self._offset)
+        return self._fields
+
+    @property
+    def timestamp_ms(self) -> int:
+        """Record time as milliseconds since epoch."""
+        return self._unpack()[0]
+
+    @property
+    def timestamp(self) -> str:
+        """Record time in ISO format."""
+        return datetime.fromtimestamp(self.timestamp_ms / 1000).isoformat()
+
+    @property
+    def priority(self) -> int:
+        return self._unpack()[1]
+
+    @property
+    def longitude(self) -> float:
+        return self._unpack()[2] / 10_000_000
+
+    @property
+    def latitude(self) -> float:
+        return self._unpack()[3] / 10_000_000
+
+    @property
+    def altitude(self) -> int:
+        return self._unpack()[4]
+
+    @property
+    def angle(self) -> int:
+        return self._unpack()[5]
+
+    @property
+    def satellites(self) -> int:
+        return self._unpack()[6]
+
+    @property
+    def speed(self) -> int:
+        return self._unpack()[7]
+
+    @property
+    def event_id(self) -> int:
+        return self._unpack()[8]
+
+    @property
+    def io_element_count(self) -> int:
+        return self._unpack()[9]
+
+    @property
+    def io_elements(self) -> list[dict[str, Any]]:
+        if self._io_elements is None:
+            self._io_elements, _ = decode_io_elements(
+                memoryview(self._buf), self._offset + AVL_RECORD.size
+            )
+        return self._io_elements
+
+    @property
+    def text(self) -> str:
+        """Return simple representation of the data record."""
+        return f"{self.timestamp}: Lat: {self.latitude}, Lon: {self.longitude}, speed: {self.speed}"
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.text})"
+
+
+class LazyAVLData:
+    """Teltonika data packet with lazily decoded records.
+
+    Only record boundaries are located when the packet is received.
+    Record fields are decoded when the handler reads them.
+    """
+
+    __slots__ = ("codec", "record_count", "_buf", "_offsets", "_records")
+
+    def __init__(self, codec: int, record_count: int, buf: bytes, offsets: list[int]):
+        self.codec = codec
+        self.record_count = record_count
+        self._buf = buf
+        self._offsets = offsets
+        self._records: list[LazyAVLDataRecord] | None = None
+
+    @classmethod
+    def from_bytes(cls, b: bytes | memoryview) -> Self:
+        # Copy the payload so buffered records don't pin the receive buffer.
+        buf = bytes(b)
+        view = memoryview(buf)
+        codec, record_count = decode_header(view)
+        offsets = []
+        offset = AVL_HEADER.size
+        for _ in range(record_count):
+            offsets.append(offset)
+            offset = skip_record(view, offset)
+        return cls(codec=codec, record_count=record_count, buf=buf, offsets=offsets)
+
+    @property
+    def records(self) -> list[LazyAVLDataRecord]:
+        if self._records is None:
+            buf = self._buf
+            self._records = [LazyAVLDataRecord(buf, offset) for offset in self._offsets]
+        return self._records
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(codec={self.codec}, record_count={self.record_count})"
+
+
+def _import_numpy():
+    """Import numpy, which is only needed for columnar decoding."""
+    try:
+        import numpy
+    except ImportError as exc:
+        raise ImportError(
+            "Columnar decoding requires numpy, install the 'columnar' extra."
+        ) from exc
+    return numpy
+
+
+@cache
+def columnar_dtypes() -> tuple["numpy.dtype", "numpy.dtype"]:
+    """Return dtypes of the columnar record and IO element tables."""
+    np = _import_numpy()
+    # Same layout as AVL_RECORD, so records are copied without conversion.
+    record = np.dtype(
+        [
+            ("timestamp", ">u8"),
+            ("priority", "u1"),
+            ("lon", ">i4"),
+            ("lat", ">i4"),
+            ("altitude", ">i2"),
+            ("angle", ">i2"),
+            ("satellites", "u1"),
+            ("speed", ">u2"),
+            ("event_id", "u1"),
+            ("io_count", "u1"),
+        ]
+    )
+    io_element = np.dtype(
+        [
+            ("record", "<u4"),
+            ("io_id", "u1"),
+            ("io_type", "u1"),
+            ("io_value", "<u8"),
+        ]
+    )
+    return record, io_element
+
+
+@dataclass(slots=True)
+class AVLBatch:
+    """Records of one or more Teltonika data packets in columnar form.
+
+    records is a structured array with one row per record; timestamp is
+    in epoch milliseconds, lat/lon in 1e-7 degrees. io_elements is a
+    sparse table of IO elements referencing rows of records.
+    """
+
+    records: "numpy.ndarray"
+    io_elements: "numpy.ndarray"
+
+    @property
+    def record_count(self) -> int:
+        return len(self.records)
+
+    @property
+    def latitude(self) -> "numpy.ndarray":
+        """Latitude of every record in degrees."""
+        return self.records["lat"] / 10_000_000
+
+    @property
+    def longitude(self) -> "numpy.ndarray":
+        """Longitude of every record in degrees."""
+        return self.records["lon"] / 10_000_000
+
+    @classmethod
+    def from_bytes(cls, b: bytes | memoryview) -> Self:
+        return cls.from_packets([b])
+
+    @classmethod
+    def from_packets(cls, packets: Iterable[bytes | memoryview]) -> Self:
+        """Decode packets, e.g. collected across connections, into one batch."""
+        np = _import_numpy()
+        record_dtype, io_dtype = columnar_dtypes()
+        packets = list(packets)
+        buf = b"".join(packets)
+        view = memoryview(buf)
+
+        # Locate records and runs of IO elements of every value size.
+        offsets: list[int] = []
+        runs = [([], [], []) for _ in IO_GROUPS]  # record, offset, count
+        groups = list(zip(IO_GROUPS, runs))
+        unpack_count = IO_COUNT.unpack_from
+        base = 0
+        for packet in packets:
+            size = len(memoryview(packet))
+            _, record_count = decode_header(view[base : base + size])
+            offset = base + AVL_HEADER.size
+            try:
+                for _ in range(record_count):
+                    record_index = len(offsets)
+                    offsets.append(offset)
+                    offset += AVL_RECORD.size
+                    for (_, element), (run_records, run_offsets, run_counts) in groups:
+                        (count,) = unpack_count(view, offset)
+                        offset += 1
+                        if count:
+                            run_records.append(record_index)
+                            run_offsets.append(offset)
+                            run_counts.append(count)
+                            offset += count * element.size
+            except struct.error as exc:
+                raise DecodeError(f"Truncated AVL record at offset {offset}") from exc
+            if offset > base + size:
+                raise DecodeError(f"Truncated AVL record at offset {offset}")
+            base += size
+
+        raw = np.frombuffer(buf, dtype=np.uint8)
+        index = np.asarray(offsets, dtype=np.intp)[:, None]
+        records = raw[index + np.arange(AVL_RECORD.size)].view(record_dtype)
+        records = records.reshape(-1)
+
+        io_elements = np.empty(sum(map(sum, (run[2] for run in runs))), dtype=io_dtype)
+        position = 0
+        for (io_type, element), (run_records, run_offsets, run_counts) in groups:
+            if not run_counts:
+                continue
+            counts = np.asarray(run_counts, dtype=np.intp)
+            total = int(counts.sum())
+            first = np.repeat(np.cumsum(counts) - counts, counts)
+            starts = np.repeat(np.asarray(run_offsets, dtype=np.intp), counts)
+            starts += (np.arange(total) - first) * element.size
+            values = raw[starts[:, None] + np.arange(1, element.size)]
+            chunk = io_elements[position : position + total]
+            chunk["record"] = np.repeat(np.asarray(run_records), counts)
+            chunk["io_id"] = raw[starts]
+            chunk["io_type"] = io_type
+            chunk["io_value"] = values.view(f">u{element.size - 1}").reshape(-1)
+            position += total
+        io_elements = io_elements[np.argsort(io_elements["record"], kind="stable")]
+
+        return cls(records=records, io_elements=io_elements)
+
+
 @dataclass
 class AVLDataResponse:
     """Teltonika response data packet."""
@@ -0,0 +1,210 @@
+"""Ingest metrics.
+
+Counters, gauges and histograms shared by the protocol server, the
+Teltonika protocol implementation and the framework, rendered in the
+Prometheus text format.
+
+Metrics are disabled by default. Instrumented code checks
+`metrics.enabled` before measuring anything, so the disabled mode
+costs one attribute lookup per measurement point.
+
+TCP worker processes send snapshot() to the supervisor, which keeps the
+latest one of each worker in WORKERS; render() adds them up with the
+values of its own process.
+"""
+
+import time
+from bisect import bisect_left
+from collections.abc import Sequence
+
+enabled = False
+
+# Latency buckets in seconds.
+DEFAULT_BUCKETS = (
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+
+REGISTRY: list["Metric"] = []
+
+# Latest snapshot() of each worker process, by worker index.
+WORKERS: dict[int, list] = {}
+
+
+def enable():
+    """Start collecting metrics."""
+    global enabled
+    enabled = True
+
+
+def disable():
+    """Stop collecting metrics."""
+    global enabled
+    enabled = False
+
+
+def _labels(labels: dict[str, str], **extra: str) -> str:
+    items = {**labels, **extra}
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items.items()) + "}"
+
+
+class Metric:
+    """Base class of metrics registered for exposition."""
+
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: dict[str, str] | None = None):
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        REGISTRY.append(self)
+
+    def state(self):
+        """Picklable value of the metric, see snapshot()."""
+        raise NotImplementedError
+
+    def samples(self, states: Sequence = ()) -> list[str]:
+        """Exposition lines, adding up states of other processes."""
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonically increasing value."""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: dict[str, str] | None = None):
+        super().__init__(name, help, labels)
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+    def state(self):
+        return self.value
+
+    def samples(self, states: Sequence = ()) -> list[str]:
+        value = self.value + sum(states)
+        return [f"{self.name}{_labels(self.labels)} {value}"]
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    type = "gauge"
+
+    def dec(self, amount: int = 1):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: dict[str, str] | None = None,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def observe_since(self, started: float):
+        """Observe seconds elapsed since a time.perf_counter() value."""
+        self.observe(time.perf_counter() - started)
+
+    def state(self):
+        return self.counts.copy(), self.sum
+
+    def samples(self, states: Sequence = ()) -> list[str]:
+        counts, total_sum = self.counts.copy(), self.sum
+        for other_counts, other_sum in states:
+            counts = [a + b for a, b in zip(counts, other_counts)]
+            total_sum += other_sum
+        lines = []
+        total = 0
+        for bound, count in zip((*self.buckets, "+Inf"), counts):
+            total += count
+            labels = _labels(self.labels, le=str(bound))
+            lines.append(f"{self.name}_bucket{labels} {total}")
+        lines.append(f"{self.name}_sum{_labels(self.labels)} {total_sum}")
+        lines.append(f"{self.name}_count{_labels(self.labels)} {total}")
+        return lines
+
+
+def snapshot() -> list:
+    """Values of all metrics, for render() in another process."""
+    return [metric.state() for metric in REGISTRY]
+
+
+def render() -> str:
+    """Render all metrics in the Prometheus text exposition format."""
+    lines = []
+    described = set()
+    workers = list(WORKERS.values())
+    for i, metric in enumerate(REGISTRY):
+        if metric.name not in described:
+            described.add(metric.name)
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+        lines.extend(metric.samples([worker[i] for worker in workers]))
+    return "\n".join(lines) + "\n"
+
+
+# Ingest metrics.
+
+FRAMES = Counter("teltonika_frames_total", "AVL frames received.")
+RECORDS = Counter("teltonika_records_total", "AVL records decoded.")
+BYTES = Counter("teltonika_received_bytes_total", "Bytes received from devices.")
+CRC_FAILURES = Counter("teltonika_crc_failures_total", "Frames with a wrong CRC.")
+LOGIN_REJECTS = Counter("teltonika_login_rejects_total", "Rejected logins.")
+
+OPEN_CONNECTIONS = Gauge("teltonika_open_connections", "Open device connections.")
+QUEUED_EVENTS = Gauge("teltonika_queued_events", "Events waiting for the app.")
+
+STAGE_HELP = "Time spent in an ingest stage."
+STAGES = {
+    stage: Histogram("teltonika_stage_seconds", STAGE_HELP, {"stage": stage})
+    for stage in ("framing", "crc", "decode", "handler", "ack")
+}
+
+DUPLICATE_FRAMES = Counter(
+    "teltonika_duplicate_frames_total", "Retransmitted frames skipped undecoded."
+)
+DUPLICATE_RECORDS = Counter(
+    "teltonika_duplicate_records_total", "Retransmitted records dropped."
+)
+
+AUTH_HELP = "Login authenticator cache lookups by result."
+AUTH_CACHE = {
+    result: Counter("teltonika_auth_cache_total", AUTH_HELP, {"result": result})
+    for result in ("hit", "miss", "coalesced")
+}
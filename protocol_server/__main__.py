@@ -1,63 +1,214 @@
 """Start protocol server."""
 
+import argparse
 import asyncio
-import importlib
+import contextlib
 import logging
-import sys
-from pathlib import Path
-
-import uvicorn
-
-from protocol_server.server import TeltonikaProtocol
+import os
+import signal
+
+import metrics
+from protocol_server.capture import CaptureWriter
+from protocol_server.lifespan import Lifespan
+from protocol_server.logs import setup_logging
+from protocol_server.utils import load_app
+from protocol_server.workers import (
+    WORKER_INDEX,
+    Supervisor,
+    create_tcp_server,
+    serve_worker,
+)
 
 LOGGER = logging.getLogger("server")
 
+TCP_APP = "application.telematica:app"
+TCP_HOST, TCP_PORT = "127.0.0.1", 8081
+HTTP_APP = "application.web:app"
+HTTP_HOST, HTTP_PORT = "127.0.0.1", 8000
 
-def load_app(module_app: str):
-    """Load ASGI application from a given path.
-
-    The path has the pattern MODULE_NAME:APP to let
-    the protocol server find and import ASGI application.
-    """
-    module, app_name = module_app.split(":")
-
-    # Determine the module path to import application module.
-    module_path = Path(module).resolve()
-    sys.path.insert(0, str(module_path.parent))
-    if module_path.is_file():
-        import_name = module_path.with_suffix("").name
-    else:
-        import_name = module_path.name
-    imported_module = importlib.import_module(import_name)
+# Seconds a TCP-only server waits for connections to drain on SIGTERM.
+GRACEFUL_TIMEOUT = 10.0
 
-    app = eval(app_name, vars(imported_module))
-    return app
 
+def get_http_server(app_path: str, host: str, port: int):
+    # Imported here so TCP-only servers never load the HTTP stack.
+    import uvicorn
 
-async def get_tcp_server(tcp_app):
-    host, port = "127.0.0.1", 8081
-    loop = asyncio.get_running_loop()
-    server = await loop.create_server(
-        protocol_factory=lambda: TeltonikaProtocol(tcp_app), host=host, port=port
-    )
-    return server
-
+    return uvicorn.Server(uvicorn.Config(app_path, host=host, port=port))
 
-async def main():
-    logging.basicConfig(level=logging.DEBUG)
 
-    # Load ASGI applications.
-    tcp_app = load_app("application.telematica:app")
-    config = uvicorn.Config("application.web:app")
+async def get_tcp_server(tcp_app, host=TCP_HOST, port=TCP_PORT, **protocol_options):
+    return await create_tcp_server(tcp_app, host, port, **protocol_options)
 
-    # Initialize servers.
-    http_server = uvicorn.Server(config)
-    tcp_server = await get_tcp_server(tcp_app)
 
-    # Run servers.
-    LOGGER.info("Starting TCP and HTTP servers...")
-    await asyncio.gather(http_server.serve(), tcp_server.serve_forever())
+async def serve_tcp(
+    app_path: str,
+    host: str,
+    port: int,
+    capture_dir: str | None = None,
+    **protocol_options,
+):
+    """Serve the TCP app in this process, next to the HTTP server."""
+    tcp_app = load_app(app_path)
+    lifespan = Lifespan(tcp_app)
+    await lifespan.startup()
+    capture = CaptureWriter.create(capture_dir) if capture_dir else None
+    tcp_server = await get_tcp_server(
+        tcp_app, host, port, capture=capture, **protocol_options
+    )
+    try:
+        await tcp_server.serve_forever()
+    finally:
+        await lifespan.shutdown()
+        if capture is not None:
+            capture.close()
+
+
+async def supervise(supervisor: Supervisor):
+    supervisor.start()
+    try:
+        await supervisor.watch()
+    finally:
+        supervisor.stop()
+
+
+async def main(
+    mode: str = "all",
+    tcp_app: str = TCP_APP,
+    tcp_host: str = TCP_HOST,
+    tcp_port: int = TCP_PORT,
+    http_app: str = HTTP_APP,
+    http_host: str = HTTP_HOST,
+    http_port: int = HTTP_PORT,
+    workers: int = 1,
+    capture_dir: str | None = None,
+    **protocol_options,
+):
+    """Run the TCP and HTTP servers ("all"), or only one of them."""
+    if mode == "tcp" and workers == 1:
+        # Publish to the shared memory bus, for an HTTP-only process.
+        os.environ.setdefault(WORKER_INDEX, "0")
+        LOGGER.info("Starting TCP server...")
+        await serve_worker(
+            tcp_app,
+            tcp_host,
+            tcp_port,
+            None,
+            GRACEFUL_TIMEOUT,
+            protocol_options,
+            capture_dir,
+        )
+        return
+
+    servers = []
+    if mode != "tcp":
+        servers.append(get_http_server(http_app, http_host, http_port).serve())
+    if mode != "http" and workers > 1:
+        supervisor = Supervisor(
+            tcp_app,
+            tcp_host,
+            tcp_port,
+            workers,
+            protocol_options=protocol_options,
+            capture_dir=capture_dir,
+        )
+        servers.append(supervise(supervisor))
+    elif mode != "http":
+        servers.append(
+            serve_tcp(tcp_app, tcp_host, tcp_port, capture_dir, **protocol_options)
+        )
+
+    LOGGER.info("Starting %s servers (%s TCP workers)...", mode, workers)
+    tasks = [asyncio.create_task(server) for server in servers]
+    if mode == "tcp":
+        # No uvicorn to catch signals; cancel supervise() so workers stop.
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, tasks[0].cancel)
+    try:
+        # Stop everything when one server exits, e.g. uvicorn on SIGINT.
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m protocol_server")
+    parser.add_argument(
+        "--mode",
+        choices=["all", "tcp", "http"],
+        default="all",
+        help="servers to run; tcp never imports the HTTP stack (default: all)",
+    )
+    parser.add_argument("--tcp-app", default=TCP_APP, help="TCP ASGI app path")
+    parser.add_argument("--tcp-host", default=TCP_HOST)
+    parser.add_argument("--tcp-port", type=int, default=TCP_PORT)
+    parser.add_argument("--http-app", default=HTTP_APP, help="HTTP ASGI app path")
+    parser.add_argument("--http-host", default=HTTP_HOST)
+    parser.add_argument("--http-port", type=int, default=HTTP_PORT)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of TCP ingest processes (default: 1, in-process)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="max AVL frames per teltonika.avl.batch event (default: 1, no batching)",
+    )
+    parser.add_argument(
+        "--batch-delay",
+        type=float,
+        default=0.0,
+        help="max seconds to wait for more frames to fill a batch (default: 0)",
+    )
+    parser.add_argument(
+        "--connection-scope",
+        action="store_true",
+        help="call the TCP app once per connection instead of once per event",
+    )
+    parser.add_argument(
+        "--capture",
+        metavar="DIR",
+        help="record received bytes to capture files in DIR for tests.emulator.replay",
+    )
+    parser.add_argument(
+        "--log-level",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="per-connection debug logs are rate-limited",
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="collect ingest metrics, served at /metrics of the HTTP app",
+    )
+    return parser.parse_args()
 
 
 if __name__ in {"__main__"}:
-    asyncio.run(main())
+    args = parse_args()
+    setup_logging(args.log_level)
+    if args.metrics:
+        metrics.enable()
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(
+            main(
+                mode=args.mode,
+                tcp_app=args.tcp_app,
+                tcp_host=args.tcp_host,
+                tcp_port=args.tcp_port,
+                http_app=args.http_app,
+                http_host=args.http_host,
+                http_port=args.http_port,
+                workers=args.workers,
+                capture_dir=args.capture,
+                max_batch_size=args.batch_size,
+                max_batch_delay=args.batch_delay,
+                connection_scope=args.connection_scope,
+            )
+        )
@@ -0,0 +1,142 @@
+"""Raw session capture.
+
+Records the bytes of every connection exactly as data_received sees
+them, to reproduce incidents and benchmark against real traffic with
+`tests/emulator/replay.py`. Each process appends to its own file:
+
+    header: magic, version, wall clock start (ns)
+    chunks: time since start (ns), connection id, kind, length, data
+
+Open chunks hold the peer address, data chunks the received bytes and
+close chunks nothing. Writes go through a large userspace buffer, so a
+chunk costs two memory copies and rarely a system call; up to
+BUFFER_SIZE bytes are lost if the process is killed.
+"""
+
+import mmap
+import os
+import struct
+import time
+from collections.abc import Iterator
+from datetime import datetime
+from typing import NamedTuple
+
+MAGIC = b"TCAP"
+VERSION = 1
+SUFFIX = ".tcap"
+# Magic, version, reserved, wall clock start in ns.
+FILE_HEADER = struct.Struct("<4sHHQ")
+# Nanoseconds since start, connection id, kind, data length.
+CHUNK_HEADER = struct.Struct("<QIBI")
+BUFFER_SIZE = 1024 * 1024
+
+# Chunk kinds.
+OPEN, DATA, CLOSE = range(3)
+
+
+class CaptureError(ValueError):
+    """Not a capture file or unsupported version."""
+
+
+class Chunk(NamedTuple):
+    """Captured chunk; data is a view into the mapped file."""
+
+    time_ns: int
+    connection: int
+    kind: int
+    data: memoryview
+
+
+class CaptureWriter:
+    """Append connection chunks to a capture file."""
+
+    def __init__(self, path: str, buffer_size: int = BUFFER_SIZE):
+        self.path = path
+        self._file = open(path, "xb", buffering=buffer_size)
+        self._started = time.monotonic_ns()
+        self._next_id = 0
+        self._file.write(FILE_HEADER.pack(MAGIC, VERSION, 0, time.time_ns()))
+
+    @classmethod
+    def create(cls, directory: str, **kwargs) -> "CaptureWriter":
+        """Start a new capture file of this process in directory."""
+        os.makedirs(directory, exist_ok=True)
+        name = f"{datetime.now():%Y%m%dT%H%M%S}-{os.getpid()}{SUFFIX}"
+        return cls(os.path.join(directory, name), **kwargs)
+
+    def _chunk(self, connection: int, kind: int, data: bytes):
+        if self._file.closed:
+            # Connections outliving the server are not recorded.
+            return
+        elapsed = time.monotonic_ns() - self._started
+        self._file.write(CHUNK_HEADER.pack(elapsed, connection, kind, len(data)))
+        self._file.write(data)
+
+    def open(self, peername) -> int:
+        """Record a new connection and return its id."""
+        connection = self._next_id
+        self._next_id += 1
+        peer = ":".join(map(str, peername[:2])) if peername else ""
+        self._chunk(connection, OPEN, peer.encode())
+        return connection
+
+    def data(self, connection: int, data: bytes):
+        """Record bytes received on a connection."""
+        self._chunk(connection, DATA, data)
+
+    def close_connection(self, connection: int):
+        """Record the end of a connection."""
+        self._chunk(connection, CLOSE, b"")
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class CaptureReader:
+    """Read a capture file through mmap without copying chunk data."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < FILE_HEADER.size:
+                raise CaptureError(f"{path}: truncated header")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        magic, version, _, self.started_ns = FILE_HEADER.unpack_from(self._view)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise CaptureError(f"{path}: not a version {VERSION} capture file")
+
+    def __iter__(self) -> Iterator[Chunk]:
+        """Yield chunks in order; a chunk cut off by a crash ends the file."""
+        view = self._view
+        end = len(view)
+        offset = FILE_HEADER.size
+        unpack = CHUNK_HEADER.unpack_from
+        while offset + CHUNK_HEADER.size <= end:
+            time_ns, connection, kind, length = unpack(view, offset)
+            offset += CHUNK_HEADER.size
+            if offset + length > end:
+                return
+            yield Chunk(time_ns, connection, kind, view[offset : offset + length])
+            offset += length
+
+    def close(self):
+        # Views handed out by __iter__ must be released before this.
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,68 @@
+"""ASGI lifespan protocol implementation."""
+
+import asyncio
+import logging
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Lifespan:
+    """Run ASGI application startup and shutdown.
+
+    Applications that don't support lifespan (raise before replying to
+    lifespan.startup) are served without it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.events: asyncio.Queue[dict] = asyncio.Queue()
+        self.startup_done = asyncio.Event()
+        self.shutdown_done = asyncio.Event()
+        self.failed: str | None = None
+        self.supported = True
+        self._task: asyncio.Task | None = None
+
+    async def main(self):
+        scope = {"type": "lifespan", "asgi": {"version": "3.0", "spec_version": "2.0"}}
+        try:
+            await self.app(scope, self.receive, self.send)
+        except Exception:
+            if not self.startup_done.is_set():
+                LOGGER.info("ASGI lifespan is not supported by the application")
+                self.supported = False
+            else:
+                LOGGER.exception("Exception in ASGI lifespan")
+        finally:
+            self.startup_done.set()
+            self.shutdown_done.set()
+
+    async def receive(self) -> dict:
+        return await self.events.get()
+
+    async def send(self, event: dict):
+        match event["type"]:
+            case "lifespan.startup.complete":
+                self.startup_done.set()
+            case "lifespan.startup.failed":
+                self.failed = event.get("message", "")
+                self.startup_done.set()
+            case "lifespan.shutdown.complete":
+                self.shutdown_done.set()
+            case "lifespan.shutdown.failed":
+                LOGGER.error("Application shutdown failed: %s", event.get("message"))
+                self.shutdown_done.set()
+
+    async def startup(self):
+        """Run application startup, raise RuntimeError if it failed."""
+        self._task = asyncio.create_task(self.main())
+        await self.events.put({"type": "lifespan.startup"})
+        await self.startup_done.wait()
+        if self.failed is not None:
+            raise RuntimeError(f"Application startup failed: {self.failed}")
+
+    async def shutdown(self):
+        """Run application shutdown."""
+        if not self.supported or self._task is None:
+            return
+        await self.events.put({"type": "lifespan.shutdown"})
+        await self.shutdown_done.wait()
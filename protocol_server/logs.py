@@ -0,0 +1,83 @@
+"""Logging off the event loop and rate-limited connection logging."""
+
+import atexit
+import logging
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+# Debug records per second logged for each connection, and the burst size.
+DEBUG_RATE = 10.0
+DEBUG_BURST = 20
+
+
+class LazyQueueHandler(QueueHandler):
+    """Queue handler leaving all formatting to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The queue is in-process, so the record does not have to be pickled.
+        return record
+
+
+def setup_logging(level: int | str = logging.INFO) -> QueueListener:
+    """Log through a queue to stderr, written by a background thread."""
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    listener = QueueListener(log_queue, handler)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(LazyQueueHandler(log_queue))
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+class ConnectionLogger:
+    """Debug logging of one connection, rate-limited with a token bucket.
+
+    Arguments are formatted only for records that are emitted.
+    """
+
+    __slots__ = (
+        "logger",
+        "peername",
+        "rate",
+        "burst",
+        "tokens",
+        "updated",
+        "suppressed",
+    )
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        peername,
+        rate: float = DEBUG_RATE,
+        burst: int = DEBUG_BURST,
+    ):
+        self.logger = logger
+        self.peername = peername
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.suppressed = 0
+
+    def debug(self, msg: str, *args):
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            self.suppressed += 1
+            return
+        self.tokens -= 1
+        if self.suppressed:
+            self.logger.debug(
+                "%s: %d debug messages suppressed", self.peername, self.suppressed
+            )
+            self.suppressed = 0
+        self.logger.debug("%s: " + msg, self.peername, *args)
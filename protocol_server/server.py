@@ -2,13 +2,16 @@
 
 import asyncio
 import logging
+import time
 
+import metrics
+from protocol_server.capture import CaptureWriter
+from protocol_server.logs import ConnectionLogger
 from teltonika import (
     AcceptPacket,
     AckPacket,
     AVLPacket,
     LoginPacket,
-    NeedMoreData,
     RejectPacket,
     Teltonika,
 )
@@ -16,89 +19,310 @@ from teltonika.packets import CRC16CheckFailed
 
 LOGGER = logging.getLogger(__name__)
 
+# Queued for a corrupted frame, so the reject is written after the acks
+# of earlier frames. Handled by the consumer, never seen by the app.
+CRC_REJECT = "teltonika.crc.reject"
+
 
 class TeltonikaProtocol(asyncio.Protocol):
-    """Implement protocol to handle incoming connections."""
+    """Implement protocol to handle incoming connections.
+
+    Events of a connection are processed in order by a single consumer
+    task. Once max_queued_events are waiting, reading from the socket
+    is paused and complete frames stay in the protocol buffer; reading
+    resumes when the queue drains to resume_queued_events.
+
+    With max_batch_size > 1, AVL frames that are ready are coalesced
+    into one teltonika.avl.batch event, waiting at most max_batch_delay
+    seconds for more frames to arrive.
+
+    By default the application is called once per event. With
+    connection_scope=True it is called once per connection and receives
+    events until teltonika.disconnect.
+
+    With a capture writer, received bytes are recorded as they arrive.
+    """
 
-    def __init__(self, app):
+    def __init__(
+        self,
+        app,
+        max_queued_events: int = 64,
+        resume_queued_events: int = 16,
+        max_batch_size: int = 1,
+        max_batch_delay: float = 0.0,
+        connection_scope: bool = False,
+        capture: CaptureWriter | None = None,
+    ):
         self.connection = Teltonika()
         self.app = app
-        self.event_queue = asyncio.Queue()
+        self.event_queue: asyncio.Queue[dict] = asyncio.Queue()
+        self.max_queued_events = max_queued_events
+        self.resume_queued_events = resume_queued_events
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+        self.connection_scope = connection_scope
+        self.capture = capture
+        self._capture_id = 0
+        self._disconnected = False
+        # Shared by all scopes of the connection, see ASGI lifespan state.
+        self.state: dict = {}
+        self._next_event: dict | None = None
+        self._reading_paused = False
+        self._draining = False
+        self._can_write = asyncio.Event()
+        self._can_write.set()
+        self._consumer: asyncio.Task | None = None
 
     def connection_made(self, transport):
-        peername = transport.get_extra_info("peername")
-        logging.debug("Connection from {}".format(peername))
+        self.log = ConnectionLogger(LOGGER, transport.get_extra_info("peername"))
+        self.log.debug("Connection made")
         self.transport = transport
+        if self.capture is not None:
+            self._capture_id = self.capture.open(transport.get_extra_info("peername"))
+        self._consumer = asyncio.create_task(self.process_events())
+        if metrics.enabled:
+            metrics.OPEN_CONNECTIONS.inc()
+
+    def connection_lost(self, exc):
+        self._disconnected = True
+        if self.capture is not None:
+            self.capture.close_connection(self._capture_id)
+        if metrics.enabled:
+            metrics.OPEN_CONNECTIONS.dec()
+            metrics.QUEUED_EVENTS.dec(self.event_queue.qsize())
+        if self.connection_scope:
+            # Let the application see the disconnect and finish.
+            self.event_queue.put_nowait({"type": "teltonika.disconnect"})
+        elif self._consumer is not None:
+            self._consumer.cancel()
+        self._can_write.set()
+
+    def pause_writing(self):
+        self._can_write.clear()
+
+    def resume_writing(self):
+        self._can_write.set()
 
     def data_received(self, data):
+        if metrics.enabled:
+            started = time.perf_counter()
+            metrics.BYTES.inc(len(data))
+        if self.capture is not None:
+            self.capture.data(self._capture_id, data)
         self.connection.receive_data(data)
-        logging.debug("Raw data received: {}".format(data))
+        self.log.debug("Raw data received: %r", data)
         self._deliver_events()
+        if metrics.enabled:
+            metrics.STAGES["framing"].observe_since(started)
 
     def _deliver_events(self):
         """Process protocol events.
 
-        NeedMoreData - Not enough data to handle. Skip processing.
-        CRC16CheckFailed - Corrupted data received. Reject packet.
+        All complete frames are drained from the connection in one pass.
+        CRC16CheckFailed - Corrupted data received. Queue a reject.
         AVLPacket | LoginPacket - Process packet.
         """
-        while True:
-            event = self.connection.next_event()
+        for event in self.connection.events():
             match event:
-                case NeedMoreData():
-                    logging.debug("Raw data is incomplete. NeedMoreData event received")
-                    break
                 case CRC16CheckFailed():
-                    logging.debug("Raw data is incorrect. CRCError event received")
-                    self.transport.write(RejectPacket.code)
-                    break
+                    self.log.debug("Raw data is incorrect. CRCError event received")
+                    self._queue_event({"type": CRC_REJECT})
                 case AVLPacket() | LoginPacket():
                     self.event_received(event)
 
+            if self.event_queue.qsize() >= self.max_queued_events:
+                self._pause_reading()
+                break
+
+    def _pause_reading(self):
+        if not self._reading_paused:
+            self._reading_paused = True
+            self.transport.pause_reading()
+
+    def _resume_reading(self):
+        if self._draining:
+            return
+        # Frames buffered while paused are queued before reading new data.
+        self._deliver_events()
+        if self._reading_paused and self.event_queue.qsize() < self.max_queued_events:
+            self._reading_paused = False
+            if not self.transport.is_closing():
+                self.transport.resume_reading()
+
     def event_received(self, event: AVLPacket | LoginPacket):
         """Prepare ASGI event and start processing."""
-        asgi_event: dict[str, bytearray | str] = {"data": event.data}
+        asgi_event: dict[str, memoryview | str] = {"data": event.data}
         match event:
             case LoginPacket():
                 asgi_event["type"] = "teltonika.login"
             case AVLPacket():
                 asgi_event["type"] = "teltonika.avl"
+        self._queue_event(asgi_event)
 
-        LOGGER.debug("Queuing event: {}".format(asgi_event))
+    def _queue_event(self, asgi_event: dict):
+        self.log.debug("Queuing event: %s", asgi_event["type"])
         self.event_queue.put_nowait(asgi_event)
+        if metrics.enabled:
+            metrics.QUEUED_EVENTS.inc()
 
-        asyncio.create_task(self.run_asgi())
+    async def _get_event(self) -> dict:
+        if self._next_event is not None:
+            event, self._next_event = self._next_event, None
+            return event
+        event = await self.event_queue.get()
+        if metrics.enabled and not self._disconnected:
+            metrics.QUEUED_EVENTS.dec()
+        if (
+            self._reading_paused
+            and self.event_queue.qsize() <= self.resume_queued_events
+        ):
+            self._resume_reading()
+        return event
 
-    async def run_asgi(self):
-        """Main ASGI entrypoint.
+    async def _collect_batch(self, event: dict) -> tuple[dict, int]:
+        """Coalesce ready AVL events, return the ASGI event and frame count."""
+        batch = [event["data"]]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_batch_delay
+        while len(batch) < self.max_batch_size:
+            if self.event_queue.empty() and self._next_event is None:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    next_event = await asyncio.wait_for(self._get_event(), timeout)
+                except TimeoutError:
+                    break
+            else:
+                next_event = await self._get_event()
+            if next_event["type"] != "teltonika.avl":
+                self._next_event = next_event
+                break
+            batch.append(next_event["data"])
+        return {"type": "teltonika.avl.batch", "data": batch}, len(batch)
 
-        This function emits event to the ASGI application.
-        """
-        scope = {
+    async def _next_asgi_event(self) -> tuple[dict, int]:
+        """Return the next ASGI event and the number of queued events in it."""
+        event = await self._get_event()
+        while event["type"] == CRC_REJECT:
+            await self.send(event)
+            self.event_queue.task_done()
+            event = await self._get_event()
+        if self.max_batch_size > 1 and event["type"] == "teltonika.avl":
+            return await self._collect_batch(event)
+        return event, 1
+
+    async def process_events(self):
+        """Run the ASGI application for queued events one at a time."""
+        if self.connection_scope:
+            await self.run_connection()
+            return
+
+        while True:
+            event, count = await self._next_asgi_event()
+            try:
+                await self.run_asgi(event)
+            except Exception:
+                LOGGER.exception("Exception in ASGI application")
+            finally:
+                for _ in range(count):
+                    self.event_queue.task_done()
+
+    async def drain(self):
+        """Stop reading, finish queued events and close the connection."""
+        if self.transport.is_closing():
+            return
+        self._draining = True
+        self._pause_reading()
+        # If the peer disconnects meanwhile the consumer stops without
+        # finishing the queue, so stop waiting once it is done.
+        joined = asyncio.ensure_future(self.event_queue.join())
+        try:
+            await asyncio.wait(
+                (joined, self._consumer), return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            joined.cancel()
+        self.transport.close()
+
+    def _scope(self, lifecycle: str) -> dict:
+        return {
             "type": "teltonika",
+            "asgi": {"version": "3.0"},
             "client": self.transport.get_extra_info("peername"),
             "scheme": "tcp",
+            "lifecycle": lifecycle,
+            "state": self.state,
         }
 
-        async def send(event):
-            LOGGER.debug("Send event: {}".format(event))
-            close = False
-            match event["type"]:
-                case "teltonika.login.accept":
-                    msg = AcceptPacket.code
-                case "teltonika.login.reject":
-                    msg = RejectPacket.code
-                    close = True
-                case "teltonika.avl.accept":
-                    msg = AckPacket(event["data"]).code
-                case _:
-                    close = True
-
-            self.transport.write(msg)
-            if close:
-                self.transport.close()
+    async def send(self, event: dict):
+        """Translate ASGI application events to protocol packets."""
+        self.log.debug("Send event: %s", event)
+        if self.transport.is_closing():
+            return
+        started = time.perf_counter() if metrics.enabled else None
+        msg, close = b"", False
+        match event["type"]:
+            case "teltonika.login.accept":
+                msg = AcceptPacket.code
+            case "teltonika.login.reject":
+                msg = RejectPacket.code
+                close = True
+                if metrics.enabled:
+                    metrics.LOGIN_REJECTS.inc()
+            case "teltonika.avl.accept":
+                msg = AckPacket(event["data"]).code
+            case "teltonika.avl.batch.accept":
+                # One ack per frame, in order, in a single write.
+                msg = b"".join(AckPacket(num).code for num in event["data"])
+            case "teltonika.crc.reject":
+                msg = RejectPacket.code
+            case _:
+                close = True
+
+        await self._can_write.wait()
+        self.transport.write(msg)
+        if close:
+            self.transport.close()
+        if started is not None:
+            metrics.STAGES["ack"].observe_since(started)
+
+    async def run_asgi(self, event: dict):
+        """Main ASGI entrypoint.
+
+        This function emits event to the ASGI application.
+        """
 
         async def receive():
-            return await self.event_queue.get()
+            return event
+
+        await self.app(self._scope("event"), receive, self.send)
 
-        await self.app(scope, receive, send)
+    async def run_connection(self):
+        """Connection-scoped ASGI entrypoint.
+
+        The application is called once and receives all events of the
+        connection, followed by teltonika.disconnect.
+        """
+        unfinished = 0
+
+        async def receive():
+            nonlocal unfinished
+            # Previous event is done once the application asks for the next.
+            for _ in range(unfinished):
+                self.event_queue.task_done()
+            unfinished = 0
+            if self._disconnected:
+                return {"type": "teltonika.disconnect"}
+            event, unfinished = await self._next_asgi_event()
+            return event
+
+        try:
+            await self.app(self._scope("connection"), receive, self.send)
+        except Exception:
+            LOGGER.exception("Exception in ASGI application")
+        finally:
+            for _ in range(unfinished):
+                self.event_queue.task_done()
+            if not self.transport.is_closing():
+                self.transport.close()
@@ -0,0 +1,26 @@
+"""Protocol server utils."""
+
+import importlib
+import sys
+from pathlib import Path
+
+
+def load_app(module_app: str):
+    """Load ASGI application from a given path.
+
+    The path has the pattern MODULE_NAME:APP to let
+    the protocol server find and import ASGI application.
+    """
+    module, app_name = module_app.split(":")
+
+    # Determine the module path to import application module.
+    module_path = Path(module).resolve()
+    sys.path.insert(0, str(module_path.parent))
+    if module_path.is_file():
+        import_name = module_path.with_suffix("").name
+    else:
+        import_name = module_path.name
+    imported_module = importlib.import_module(import_name)
+
+    app = eval(app_name, vars(imported_module))
+    return app
@@ -0,0 +1,271 @@
+"""Multi-process TCP ingest.
+
+The supervisor starts N worker processes. Each worker loads the ASGI
+application and serves the Teltonika port on its own event loop. With
+SO_REUSEPORT every worker binds the port itself and the kernel spreads
+connections between them; otherwise workers share a socket bound by
+the supervisor. Crashed workers are restarted, SIGTERM lets workers
+finish queued events before exiting. With metrics enabled, workers send
+snapshots of their metrics to the supervisor process.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import socket
+import time
+import weakref
+from multiprocessing.process import BaseProcess
+from multiprocessing.queues import Queue
+
+import metrics
+from protocol_server.capture import CaptureWriter
+from protocol_server.lifespan import Lifespan
+from protocol_server.logs import setup_logging
+from protocol_server.server import TeltonikaProtocol
+from protocol_server.utils import load_app
+
+LOGGER = logging.getLogger(__name__)
+
+# Workers are spawned rather than forked from the running event loop.
+CONTEXT = multiprocessing.get_context("spawn")
+
+# Minimum delay between restarts of a crashing worker.
+RESTART_DELAY = 1.0
+
+# Environment variable holding the index of a worker, kept across restarts.
+WORKER_INDEX = "WORKER_INDEX"
+
+# Seconds between metric snapshots sent by a worker.
+METRICS_INTERVAL = 1.0
+
+
+async def create_tcp_server(
+    tcp_app,
+    host: str | None = None,
+    port: int | None = None,
+    sock: socket.socket | None = None,
+    reuse_port: bool = False,
+    connections: weakref.WeakSet | None = None,
+    **protocol_options,
+) -> asyncio.Server:
+    """Start serving the Teltonika protocol, optionally tracking connections.
+
+    protocol_options are passed to every TeltonikaProtocol.
+    """
+
+    def protocol_factory():
+        protocol = TeltonikaProtocol(tcp_app, **protocol_options)
+        if connections is not None:
+            connections.add(protocol)
+        return protocol
+
+    loop = asyncio.get_running_loop()
+    if sock is not None:
+        return await loop.create_server(protocol_factory, sock=sock)
+    return await loop.create_server(
+        protocol_factory, host=host, port=port, reuse_port=reuse_port or None
+    )
+
+
+async def serve_worker(
+    app_path: str,
+    host: str,
+    port: int,
+    sock: socket.socket | None,
+    graceful_timeout: float,
+    protocol_options: dict,
+    capture_dir: str | None = None,
+    metrics_queue: Queue | None = None,
+):
+    """Serve until SIGTERM/SIGINT, then drain open connections.
+
+    With capture_dir, received bytes are recorded to a capture file.
+    With metrics_queue, metric snapshots are sent to the supervisor.
+    """
+    app = load_app(app_path)
+    lifespan = Lifespan(app)
+    await lifespan.startup()
+    capture = CaptureWriter.create(capture_dir) if capture_dir else None
+    connections: weakref.WeakSet[TeltonikaProtocol] = weakref.WeakSet()
+    server = await create_tcp_server(
+        app,
+        host,
+        port,
+        sock=sock,
+        reuse_port=sock is None,
+        connections=connections,
+        capture=capture,
+        **protocol_options,
+    )
+
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    LOGGER.info(
+        "Worker %s serving on %s:%s", multiprocessing.current_process().name, host, port
+    )
+    reporter = None
+    if metrics_queue is not None:
+        reporter = asyncio.create_task(report_metrics(metrics_queue))
+    await stop.wait()
+
+    server.close()
+    drains = [connection.drain() for connection in list(connections)]
+    try:
+        await asyncio.wait_for(asyncio.gather(*drains), graceful_timeout)
+    except TimeoutError:
+        LOGGER.warning("Connections were not drained in %ss", graceful_timeout)
+    await lifespan.shutdown()
+    if capture is not None:
+        capture.close()
+    if reporter is not None:
+        reporter.cancel()
+
+
+async def report_metrics(metrics_queue: Queue, interval: float = METRICS_INTERVAL):
+    """Send metric snapshots of this worker to the supervisor."""
+    # A supervisor that stopped reading must not block the worker's exit.
+    metrics_queue.cancel_join_thread()
+    index = int(os.environ[WORKER_INDEX])
+    while True:
+        await asyncio.sleep(interval)
+        metrics_queue.put((index, metrics.snapshot()))
+
+
+def run_worker(
+    app_path: str,
+    host: str,
+    port: int,
+    sock: socket.socket | None,
+    graceful_timeout: float,
+    protocol_options: dict,
+    log_level: int,
+    index: int = 0,
+    capture_dir: str | None = None,
+    metrics_queue: Queue | None = None,
+):
+    """Worker process entrypoint."""
+    # Lets the application tell workers apart, e.g. to name shared resources.
+    os.environ[WORKER_INDEX] = str(index)
+    setup_logging(log_level)
+    if metrics_queue is not None:
+        metrics.enable()
+    asyncio.run(
+        serve_worker(
+            app_path,
+            host,
+            port,
+            sock,
+            graceful_timeout,
+            protocol_options,
+            capture_dir,
+            metrics_queue,
+        )
+    )
+
+
+class Supervisor:
+    """Start, watch and restart TCP worker processes."""
+
+    def __init__(
+        self,
+        app_path: str,
+        host: str,
+        port: int,
+        workers: int,
+        graceful_timeout: float = 10.0,
+        protocol_options: dict | None = None,
+        capture_dir: str | None = None,
+    ):
+        self.app_path = app_path
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.protocol_options = protocol_options or {}
+        self.capture_dir = capture_dir
+        self.processes: list[BaseProcess] = []
+        self.started_at: list[float] = []
+        self.sock: socket.socket | None = None
+        self.metrics_queue: Queue | None = None
+        self._stopping = False
+
+    def start(self):
+        """Start all workers."""
+        if not hasattr(socket, "SO_REUSEPORT"):
+            self.sock = socket.create_server((self.host, self.port))
+        if metrics.enabled:
+            self.metrics_queue = CONTEXT.Queue()
+        for index in range(self.workers):
+            self.processes.append(self._spawn(index))
+            self.started_at.append(time.monotonic())
+
+    def _spawn(self, index: int) -> BaseProcess:
+        process = CONTEXT.Process(
+            target=run_worker,
+            args=(
+                self.app_path,
+                self.host,
+                self.port,
+                self.sock,
+                self.graceful_timeout,
+                self.protocol_options,
+                logging.getLogger().level,
+                index,
+                self.capture_dir,
+                self.metrics_queue,
+            ),
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    async def watch(self, interval: float = 0.5):
+        """Restart workers that exited unexpectedly."""
+        while not self._stopping:
+            await asyncio.sleep(interval)
+            self._collect_metrics()
+            for i, process in enumerate(self.processes):
+                if process.is_alive() or self._stopping:
+                    continue
+                if time.monotonic() - self.started_at[i] < RESTART_DELAY:
+                    continue
+                LOGGER.warning(
+                    "Worker %s exited with code %s, restarting",
+                    process.name,
+                    process.exitcode,
+                )
+                self.processes[i] = self._spawn(i)
+                self.started_at[i] = time.monotonic()
+
+    def _collect_metrics(self):
+        """Keep the latest metric snapshot of each worker for render()."""
+        if self.metrics_queue is None:
+            return
+        while True:
+            try:
+                index, snapshot = self.metrics_queue.get_nowait()
+            except queue.Empty:
+                return
+            metrics.WORKERS[index] = snapshot
+
+    def stop(self):
+        """Ask workers to drain and exit, kill those that don't."""
+        self._stopping = True
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + self.graceful_timeout + 1
+        for process in self.processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                LOGGER.warning("Worker %s did not exit, killing", process.name)
+                process.kill()
+                process.join()
+        if self.sock is not None:
+            self.sock.close()
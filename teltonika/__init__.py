@@ -4,6 +4,7 @@ This module provides an abstraction over protocol (Teltonika) implementation.
 Instead of talking in bytes, it lets you talk in Teltonika “events”.
 """
 
+from .encoder import Record, encode_ack, encode_avl, encode_avl_many, encode_login
 from .packets import (
     AcceptPacket,
     AckPacket,
@@ -22,4 +23,9 @@ __all__ = [
     "RejectPacket",
     "AckPacket",
     "NeedMoreData",
+    "Record",
+    "encode_login",
+    "encode_avl",
+    "encode_avl_many",
+    "encode_ack",
 ]
@@ -0,0 +1,209 @@
+"""Encode Teltonika packets.
+
+The counterpart of the decoders in `framework.utils`, used by the
+emulator, load generators and benchmarks. Frames are packed into
+preallocated buffers with precompiled structs; encode_avl_many() packs
+many frames into a single buffer.
+"""
+
+import struct
+from collections.abc import Iterable, Mapping, Sequence
+from typing import NamedTuple
+
+from teltonika.crc import crc16
+
+CODEC_8 = 0x08
+
+LOGIN_HEADER = struct.Struct(">H")
+# Zero preamble, data field length.
+FRAME_HEADER = struct.Struct(">II")
+# Codec id, number of records.
+AVL_HEADER = struct.Struct(">BB")
+# Timestamp, priority, longitude, latitude, altitude, angle, satellites,
+# speed, event IO id, total IO count. Same layout as the decoder.
+AVL_RECORD = struct.Struct(">QBiihhBHBB")
+# AVL_RECORD followed by four empty IO groups.
+AVL_RECORD_NO_IO = struct.Struct(">QBiihhBHBBBBBB")
+IO_COUNT = struct.Struct(">B")
+# IO element structs by group, in wire order: 1, 2, 4 and 8 byte values.
+IO_ELEMENTS = (
+    struct.Struct(">BB"),
+    struct.Struct(">BH"),
+    struct.Struct(">BI"),
+    struct.Struct(">BQ"),
+)
+RECORD_COUNT = struct.Struct(">B")
+CRC = struct.Struct(">I")
+ACK = struct.Struct(">B")
+
+# Frame bytes besides the records: header, codec id, two record counts, CRC.
+FRAME_OVERHEAD = FRAME_HEADER.size + AVL_HEADER.size + RECORD_COUNT.size + CRC.size
+
+# (io_id, value) pairs of each IO group.
+IOGroups = tuple[Sequence[tuple[int, int]], ...]
+NO_IO: IOGroups = ((), (), (), ())
+
+
+class Record(NamedTuple):
+    """AVL record to encode.
+
+    timestamp is in epoch milliseconds, coordinates in degrees.
+    io_elements holds the four IO groups, see group_io().
+    """
+
+    timestamp: int
+    latitude: float = 0.0
+    longitude: float = 0.0
+    altitude: int = 0
+    angle: int = 0
+    satellites: int = 0
+    speed: int = 0
+    priority: int = 0
+    event_id: int = 0
+    io_elements: IOGroups = NO_IO
+
+
+def group_io(elements: Mapping[int, int]) -> IOGroups:
+    """Put each IO value into the smallest group it fits in."""
+    groups: tuple[list, ...] = ([], [], [], [])
+    for io_id, value in elements.items():
+        if value < 0 or value.bit_length() > 64:
+            raise ValueError(f"IO {io_id} value out of range: {value}")
+        size = (value.bit_length() + 7) // 8
+        group = 0 if size <= 1 else 1 if size <= 2 else 2 if size <= 4 else 3
+        groups[group].append((io_id, value))
+    return groups
+
+
+def encode_login(imei: str) -> bytes:
+    """Encode the login packet sent by a device after connecting."""
+    data = imei.encode("ascii")
+    return LOGIN_HEADER.pack(len(data)) + data
+
+
+def encode_ack(count: int) -> bytes:
+    """Encode the server acknowledgement of count records."""
+    return ACK.pack(count)
+
+
+def record_size(record: Record) -> int:
+    """Return the encoded size of a record."""
+    groups = record.io_elements
+    if groups is NO_IO:
+        return AVL_RECORD_NO_IO.size
+    size = AVL_RECORD.size + len(IO_ELEMENTS) * IO_COUNT.size
+    for group, element in zip(groups, IO_ELEMENTS):
+        size += len(group) * element.size
+    return size
+
+
+def pack_record_into(buf: bytearray, offset: int, record: Record) -> int:
+    """Pack a record at offset, return the offset past its end."""
+    (
+        timestamp,
+        latitude,
+        longitude,
+        altitude,
+        angle,
+        satellites,
+        speed,
+        priority,
+        event_id,
+        groups,
+    ) = record
+    longitude = round(longitude * 10_000_000)
+    latitude = round(latitude * 10_000_000)
+    if groups is NO_IO:
+        AVL_RECORD_NO_IO.pack_into(
+            buf,
+            offset,
+            timestamp,
+            priority,
+            longitude,
+            latitude,
+            altitude,
+            angle,
+            satellites,
+            speed,
+            event_id,
+            0,
+            0,
+            0,
+            0,
+            0,
+        )
+        return offset + AVL_RECORD_NO_IO.size
+
+    AVL_RECORD.pack_into(
+        buf,
+        offset,
+        timestamp,
+        priority,
+        longitude,
+        latitude,
+        altitude,
+        angle,
+        satellites,
+        speed,
+        event_id,
+        sum(map(len, groups)),
+    )
+    offset += AVL_RECORD.size
+    for group, element in zip(groups, IO_ELEMENTS):
+        IO_COUNT.pack_into(buf, offset, len(group))
+        offset += IO_COUNT.size
+        for io_id, value in group:
+            element.pack_into(buf, offset, io_id, value)
+            offset += element.size
+    return offset
+
+
+def frame_size(records: Sequence[Record]) -> int:
+    """Return the encoded size of a Codec 8 frame with records."""
+    return FRAME_OVERHEAD + sum(map(record_size, records))
+
+
+def pack_avl_into(buf: bytearray, offset: int, records: Sequence[Record]) -> int:
+    """Pack a Codec 8 frame at offset, return the offset past its end."""
+    count = len(records)
+    if not 0 < count < 256:
+        raise ValueError(f"A frame holds 1 to 255 records, got {count}")
+    start = offset + FRAME_HEADER.size
+    position = start + AVL_HEADER.size
+    AVL_HEADER.pack_into(buf, start, CODEC_8, count)
+    for record in records:
+        position = pack_record_into(buf, position, record)
+    RECORD_COUNT.pack_into(buf, position, count)
+    position += RECORD_COUNT.size
+    FRAME_HEADER.pack_into(buf, offset, 0, position - start)
+    with memoryview(buf) as view:
+        CRC.pack_into(buf, position, crc16(view[start:position]))
+    return position + CRC.size
+
+
+def encode_avl(records: Sequence[Record]) -> bytes:
+    """Encode records as a Codec 8 frame."""
+    buf = bytearray(frame_size(records))
+    pack_avl_into(buf, 0, records)
+    return bytes(buf)
+
+
+def encode_avl_many(frames: Iterable[Sequence[Record]]) -> list[memoryview]:
+    """Encode many Codec 8 frames into one buffer.
+
+    Returns read-only views of the frames in that buffer; they can be
+    written to a transport one by one or joined into a pipelined stream.
+    """
+    frames = list(frames)
+    sizes = [frame_size(records) for records in frames]
+    buf = bytearray(sum(sizes))
+    offset = 0
+    for records in frames:
+        offset = pack_avl_into(buf, offset, records)
+    view = memoryview(buf).toreadonly()
+    result = []
+    offset = 0
+    for size in sizes:
+        result.append(view[offset : offset + size])
+        offset += size
+    return result
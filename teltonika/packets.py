@@ -10,14 +10,14 @@ from dataclasses import dataclass
 class LoginPacket:
     """Client connection request with IMEI."""
 
-    data: bytearray
+    data: memoryview
 
 
 @dataclass(frozen=True)
 class AVLPacket:
     """Client data event."""
 
-    data: bytearray
+    data: memoryview
 
 
 # Server packets.
@@ -1,9 +1,12 @@
 """Implement Teltonika to process incoming bytes to events."""
 
 import logging
+import time
 from enum import StrEnum
-from typing import TypeAlias
+from typing import Iterator, TypeAlias
 
+import metrics
+from teltonika.crc import CRC16, crc16
 from teltonika.packets import AVLPacket, CRC16CheckFailed, LoginPacket, NeedMoreData
 
 LOGGER = logging.getLogger(__name__)
@@ -19,67 +22,125 @@ class ProtocolState(StrEnum):
 
 
 class Teltonika:
-    """Translate incoming bytes to events."""
+    """Translate incoming bytes to events.
+
+    Received data is kept in a single buffer with a read offset, so
+    consuming a frame does not copy the rest of the buffer. Frame
+    payloads are returned as memoryview slices of that buffer.
+
+    Consumed data is dropped in place once COMPACT_THRESHOLD bytes
+    were read. While payload views are still alive the buffer can not
+    be resized; the unread data is then copied to a new buffer.
+    """
+
+    COMPACT_THRESHOLD = 64 * 1024
 
     def __init__(self):
         """Initialize empty buffer and initial state."""
         self._buffer = bytearray()
+        self._offset = 0
         self._state = ProtocolState.LOGIN
+        self._crc = CRC16()
+        self._crc_fed = 0
 
     def receive_data(self, data: bytes):
         """Append received data to buffer."""
-        self._buffer.extend(data)
+        try:
+            if self._offset >= self.COMPACT_THRESHOLD:
+                del self._buffer[: self._offset]
+                self._offset = 0
+            self._buffer.extend(data)
+        except BufferError:
+            # Payload views still point into the buffer, so it cannot be
+            # resized. Start a new one with the unread data only.
+            self._buffer = self._buffer[self._offset :] + data
+            self._offset = 0
+        self._update_crc()
+
+    def _update_crc(self):
+        """Feed newly received payload bytes of the pending frame to the CRC."""
+        offset = self._offset
+        if self._state != ProtocolState.DATA or len(self._buffer) - offset < 8:
+            return
+        data_len = int.from_bytes(self._buffer[offset + 4 : offset + 8], "big")
+        start = offset + 8 + self._crc_fed
+        end = min(len(self._buffer), offset + 8 + data_len)
+        if end > start:
+            if metrics.enabled:
+                started = time.perf_counter()
+            with memoryview(self._buffer) as view:
+                self._crc.update(view[start:end])
+            self._crc_fed = end - offset - 8
+            if metrics.enabled:
+                metrics.STAGES["crc"].observe_since(started)
+
+    def _consume(self, start: int, end: int, total_len: int) -> memoryview:
+        """Return a view on the frame payload and advance the read offset."""
+        data = memoryview(self._buffer)[self._offset + start : self._offset + end]
+        self._offset += total_len
+        return data
 
     def next_event(self) -> ProtocolEvent:
         """Process incoming data to protocol events."""
+        available = len(self._buffer) - self._offset
+        offset = self._offset
+
         if self._state == ProtocolState.LOGIN:
-            if len(self._buffer) <= 2:
+            if available <= 2:
                 return NeedMoreData()
-            else:
-                imei_len = int.from_bytes(self._buffer[0:2], "big")
-                total_len = 2 + imei_len
-                if len(self._buffer) < total_len:
-                    return NeedMoreData()
-                if len(self._buffer) == total_len:
-                    raw_data = self._buffer[2:]
-                    self._buffer = self._buffer[total_len:]
-                    self._state = ProtocolState.DATA
-                    return LoginPacket(data=raw_data)
-                else:
-                    return NeedMoreData()
+            imei_len = int.from_bytes(self._buffer[offset : offset + 2], "big")
+            total_len = 2 + imei_len
+            if available < total_len:
+                return NeedMoreData()
+            raw_data = self._consume(2, total_len, total_len)
+            self._state = ProtocolState.DATA
+            self._update_crc()
+            return LoginPacket(data=raw_data)
 
         if self._state == ProtocolState.DATA:
-            if len(self._buffer) < 8:
+            if available < 8:
                 return NeedMoreData()
 
-            data_len = int.from_bytes(self._buffer[4:8], "big")
+            data_len = int.from_bytes(self._buffer[offset + 4 : offset + 8], "big")
             total_len = 8 + data_len + 4
 
-            if len(self._buffer) < total_len:
+            if available < total_len:
                 return NeedMoreData()
 
-            raw_packet = self._buffer[:total_len]
-            data = raw_packet[8:-4]
-            crc16 = int.from_bytes(raw_packet[-4:], "big")
+            self._update_crc()
+            crc_start = offset + total_len - 4
+            crc = int.from_bytes(self._buffer[crc_start : crc_start + 4], "big")
 
-            if Teltonika._crc16(data) != crc16:
+            if self._crc.value != crc:
                 LOGGER.debug("CRC check failed.")
+                if metrics.enabled:
+                    metrics.CRC_FAILURES.inc()
                 return CRC16CheckFailed()
 
-            self._buffer = self._buffer[total_len:]
+            data = self._consume(8, 8 + data_len, total_len)
+            self._crc.reset()
+            self._crc_fed = 0
+            self._update_crc()
+            if metrics.enabled:
+                metrics.FRAMES.inc()
             return AVLPacket(data=data)
 
         return NeedMoreData()
 
+    def events(self) -> Iterator[LoginPacket | AVLPacket | CRC16CheckFailed]:
+        """Drain all complete frames from the buffer in one pass.
+
+        Stops when more data is needed or after a CRC check failure.
+        """
+        while True:
+            event = self.next_event()
+            if isinstance(event, NeedMoreData):
+                return
+            yield event
+            if isinstance(event, CRC16CheckFailed):
+                return
+
     @staticmethod
     def _crc16(data: bytes) -> int:
         """Calculate CRC-16-IBM."""
-        crc = 0x0000
-        for byte in data:
-            crc ^= byte
-            for _ in range(8):
-                if crc & 1:
-                    crc = (crc >> 1) ^ 0xA001
-                else:
-                    crc >>= 1
-        return crc & 0xFFFF
+        return crc16(data)
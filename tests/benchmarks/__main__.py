@@ -0,0 +1,204 @@
+"""Ingest hot path benchmark suite.
+
+Runs every benchmark, prints operations/sec and optionally writes the
+results as JSON. Results of another run (e.g. on the previous commit)
+can be passed to --compare; benchmarks slower by more than --threshold
+are reported and the run exits with status 1. Run from the repository
+root:
+
+    python -m tests.benchmarks --output before.json
+    python -m tests.benchmarks --compare before.json --threshold 0.1
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+from collections.abc import Callable
+
+import metrics
+from framework.byte_reader import ByteReader
+from framework.utils import AVLData
+from protocol_server.server import TeltonikaProtocol
+from teltonika import Teltonika
+from tests.benchmarks.avl_decode import payload
+from tests.benchmarks.common import FakeTransport, make_app
+from tests.emulator.run import create_codec8_message, create_imei_packet
+
+IMEI_PACKET = create_imei_packet("123456789012345")
+FRAME = create_codec8_message(timestamp=1_700_000_000_000)
+PIPELINED = FRAME * 100
+
+# Benchmark name -> (function, operations per call).
+BENCHMARKS: dict[str, tuple[Callable[[], object], int]] = {}
+
+
+def benchmark(name: str, ops: int = 1):
+    """Register a benchmark performing ops operations per call."""
+
+    def decorator(func):
+        BENCHMARKS[name] = (func, ops)
+        return func
+
+    return decorator
+
+
+def logged_in() -> Teltonika:
+    connection = Teltonika()
+    connection.receive_data(IMEI_PACKET)
+    connection.next_event()
+    return connection
+
+
+@benchmark("framing.pipelined", ops=100)
+def framing_pipelined():
+    connection = logged_in()
+    connection.receive_data(PIPELINED)
+    for _ in connection.events():
+        pass
+
+
+@benchmark("framing.fragmented", ops=10)
+def framing_fragmented():
+    connection = logged_in()
+    data = FRAME * 10
+    for i in range(0, len(data), 7):
+        connection.receive_data(data[i : i + 7])
+        for _ in connection.events():
+            pass
+
+
+CRC_DATA = os.urandom(1024)
+
+
+@benchmark("crc16.1k", ops=1024)
+def crc16():
+    Teltonika._crc16(CRC_DATA)
+
+
+BYTE_READER_DATA = bytes(range(256)) * 4
+
+
+@benchmark("byte_reader.mixed", ops=100)
+def byte_reader():
+    stream = ByteReader(BYTE_READER_DATA)
+    for _ in range(20):
+        stream.read_u8()
+        stream.read_u16()
+        stream.read_u32()
+        stream.read_i16()
+        stream.read_i32()
+
+
+for io_count in (0, 4, 16):
+    data = payload(io_count)
+    benchmark(f"avl_decode.io{io_count}", ops=50)(
+        lambda data=data: AVLData.from_bytes(data)
+    )
+
+
+def protocol_path(frames: int, chunk: int | None, **protocol_options) -> Callable:
+    """Drive TeltonikaProtocol with a fake transport until all frames are acked."""
+    app = make_app(lazy=True)
+    data = IMEI_PACKET + FRAME * frames
+
+    async def run():
+        protocol = TeltonikaProtocol(app, **protocol_options)
+        transport = FakeTransport()
+        protocol.connection_made(transport)
+        step = chunk or len(data)
+        for i in range(0, len(data), step):
+            protocol.data_received(data[i : i + step])
+        while len(transport.written) < frames + 1:
+            await asyncio.sleep(0)
+        protocol.connection_lost(None)
+
+    loop = asyncio.new_event_loop()
+    return lambda: loop.run_until_complete(run())
+
+
+benchmark("protocol.pipelined", ops=100)(protocol_path(100, None))
+benchmark("protocol.fragmented", ops=100)(protocol_path(100, 64))
+benchmark("protocol.batched", ops=100)(protocol_path(100, None, max_batch_size=32))
+
+
+def measure(func: Callable, ops: int, min_time: float = 0.2) -> float:
+    """Return operations/sec using the fastest of several repeats."""
+    number = 1
+    while timeit.timeit(func, number=number) < min_time / 5:
+        number *= 2
+    best = min(timeit.repeat(func, number=number, repeat=5))
+    return ops * number / best
+
+
+def metadata() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "metrics": metrics.enabled,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Return names of benchmarks slower than baseline by more than threshold."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        change = result["ops_per_sec"] / before["ops_per_sec"] - 1
+        marker = ""
+        if change < -threshold:
+            regressions.append(name)
+            marker = "  REGRESSION"
+        print(f"{name:<24} {change:+8.1%}{marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m tests.benchmarks")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--filter", default="", help="run benchmarks containing this")
+    parser.add_argument("--metrics", action="store_true", help="enable metrics")
+    args = parser.parse_args()
+    if args.metrics:
+        metrics.enable()
+
+    results = {}
+    for name, (func, ops) in BENCHMARKS.items():
+        if args.filter not in name:
+            continue
+        rate = measure(func, ops)
+        results[name] = {"ops_per_sec": rate}
+        print(f"{name:<24} {rate:>14,.0f} ops/s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"meta": metadata(), "results": results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        print()
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark columnar AVL decoding.
+
+Decodes a batch of 10k records (100 packets of 100 records) into
+AVLData/LazyAVLData objects and into a single columnar AVLBatch.
+Requires numpy. Run from the repository root:
+
+    python -m tests.benchmarks.avl_columnar
+"""
+
+import struct
+import timeit
+
+from framework.utils import AVLBatch, AVLData, LazyAVLData
+
+PACKETS = 100
+RECORDS = 100
+GPS = struct.Struct(">QBiihhBHBB")
+
+
+def payload(io_count: int) -> bytes:
+    """Codec 8 payload with io_count 1-byte and 4-byte IO elements per record."""
+    records = []
+    for i in range(RECORDS):
+        record = GPS.pack(
+            1_700_000_000_000 + i,
+            0,
+            252797000 + i,
+            546872000 - i,
+            100,
+            0,
+            5,
+            10,
+            0,
+            2 * io_count,
+        )
+        record += bytes([io_count])
+        record += b"".join(struct.pack(">BB", n, 1) for n in range(io_count))
+        record += b"\x00"  # no 2-byte elements
+        record += bytes([io_count])
+        record += b"".join(struct.pack(">BI", n, i) for n in range(io_count))
+        record += b"\x00"  # no 8-byte elements
+        records.append(record)
+    return bytes([0x08, RECORDS]) + b"".join(records) + bytes([RECORDS])
+
+
+def objects(packets: list[bytes]) -> int:
+    return sum(len(AVLData.from_bytes(p).records) for p in packets)
+
+
+def lazy_objects(packets: list[bytes]) -> int:
+    return sum(
+        len([(r.latitude, r.longitude) for r in LazyAVLData.from_bytes(p).records])
+        for p in packets
+    )
+
+
+def columnar(packets: list[bytes]) -> int:
+    return AVLBatch.from_packets(packets).record_count
+
+
+def main():
+    for io_count in (0, 4):
+        packets = [payload(io_count)] * PACKETS
+        batch = AVLBatch.from_packets(packets)
+        eager = [r for p in packets for r in AVLData.from_bytes(p).records]
+        assert batch.record_count == len(eager) == PACKETS * RECORDS
+        assert batch.latitude.tolist() == [r.latitude for r in eager]
+        assert len(batch.io_elements) == sum(r.io_element_count for r in eager)
+
+        for name, func in (
+            ("objects", objects),
+            ("lazy", lazy_objects),
+            ("columnar", columnar),
+        ):
+            seconds = min(timeit.repeat(lambda: func(packets), number=3, repeat=5)) / 3
+            rate = PACKETS * RECORDS / seconds
+            print(f"{name:<9} io={2 * io_count:<3} {rate:>12,.0f} records/s")
+
+
+if __name__ == "__main__":
+    main()
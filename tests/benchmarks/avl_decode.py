@@ -0,0 +1,118 @@
+"""Benchmark AVLData decoding.
+
+Compares the precompiled struct decoder in `framework.utils` with the
+previous per-field ByteReader decoder, and the lazy decoder reading
+only the position of each record. Run from the repository root:
+
+    python -m tests.benchmarks.avl_decode
+"""
+
+import struct
+import timeit
+import tracemalloc
+from datetime import datetime
+
+from framework.byte_reader import ByteReader
+from framework.utils import AVLData, AVLDataRecord, LazyAVLData
+
+RECORDS = 50
+
+
+def legacy_record(stream: ByteReader) -> AVLDataRecord:
+    """Previous AVLDataRecord.from_stream decoder."""
+    ts = stream.read_u64()
+    fields = {
+        "timestamp": datetime.fromtimestamp(ts / 1000).isoformat(),
+        "priority": stream.read_u8(),
+        "longitude": stream.read_i32() / 10_000_000,
+        "latitude": stream.read_i32() / 10_000_000,
+        "altitude": stream.read_i16(),
+        "angle": stream.read_i16(),
+        "satellites": stream.read_u8(),
+        "speed": stream.read_u16(),
+        "event_id": stream.read_u8(),
+    }
+    total_io = stream.read_u8()
+    io_elements = []
+    for _ in range(total_io):
+        io_id = stream.read_u8()
+        io_type = stream.read_u8()
+        if io_type == 0x01:
+            io_value = stream.read_u8()
+        elif io_type == 0x02:
+            io_value = stream.read_u16()
+        else:
+            io_value = stream.read_u32()
+        io_elements.append({"io_id": io_id, "io_type": io_type, "io_value": io_value})
+    return AVLDataRecord(io_element_count=total_io, io_elements=io_elements, **fields)
+
+
+def legacy_decode(b: bytes) -> list[AVLDataRecord]:
+    """Previous AVLData.from_bytes decoder."""
+    stream = ByteReader(b)
+    stream.read_u8()
+    record_count = stream.read_u8()
+    return [legacy_record(stream) for _ in range(record_count)]
+
+
+GPS = struct.Struct(">QBiihhBHB")
+
+
+def legacy_payload(io_count: int) -> bytes:
+    """Payload in the layout expected by the previous decoder."""
+    record = GPS.pack(1_700_000_000_000, 0, 252797000, 546872000, 100, 0, 5, 10, 0)
+    record += bytes([io_count])
+    record += b"".join(struct.pack(">BBB", i, 0x01, 1) for i in range(io_count))
+    return bytes([0x08, RECORDS]) + record * RECORDS + bytes([RECORDS])
+
+
+def payload(io_count: int) -> bytes:
+    """Codec 8 payload with io_count one-byte IO elements per record."""
+    record = GPS.pack(1_700_000_000_000, 0, 252797000, 546872000, 100, 0, 5, 10, 0)
+    record += bytes([io_count, io_count])
+    record += b"".join(struct.pack(">BB", i, 1) for i in range(io_count))
+    record += b"\x00\x00\x00"
+    return bytes([0x08, RECORDS]) + record * RECORDS + bytes([RECORDS])
+
+
+def bench(name: str, func, data: bytes, io_count: int):
+    """Print decoding throughput in records/sec."""
+    number = 200
+    seconds = min(timeit.repeat(lambda: func(data), number=number, repeat=5))
+    rate = RECORDS * number / seconds
+    print(f"{name:<8} io={io_count:<3} {rate:>12,.0f} records/s")
+
+
+def lazy_positions(data: bytes) -> list[tuple[float, float]]:
+    """Decode lazily and read only latitude and longitude."""
+    return [(r.latitude, r.longitude) for r in LazyAVLData.from_bytes(data).records]
+
+
+def memory_per_record(decode, data: bytes, packets: int = 200) -> float:
+    """Bytes allocated per buffered record."""
+    tracemalloc.start()
+    buffered = [decode(data).records for _ in range(packets)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del buffered
+    return size / (packets * RECORDS)
+
+
+def main():
+    for io_count in (0, 4, 16):
+        assert len(AVLData.from_bytes(payload(io_count)).records) == RECORDS
+        assert len(legacy_decode(legacy_payload(io_count))) == RECORDS
+        bench("before", legacy_decode, legacy_payload(io_count), io_count)
+        bench("after", AVLData.from_bytes, payload(io_count), io_count)
+        bench("lazy", lazy_positions, payload(io_count), io_count)
+
+    data = payload(4)
+    for name, decode in (
+        ("eager", AVLData.from_bytes),
+        ("lazy", LazyAVLData.from_bytes),
+    ):
+        print(f"{name:<8} {memory_per_record(decode, data):8.0f} bytes/record")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Benchmark the cost of session capture on the receive path.
+
+Drives TeltonikaProtocol with pipelined and fragmented frames, with and
+without a capture writer, then reads the capture back through mmap.
+Run from the repository root:
+
+    python -m tests.benchmarks.capture
+"""
+
+import os
+import tempfile
+import timeit
+
+from protocol_server.capture import CaptureReader, CaptureWriter
+from tests.benchmarks.__main__ import protocol_path
+
+FRAMES = 100
+
+
+def per_frame(func) -> float:
+    """Microseconds per frame."""
+    number = 50
+    return min(timeit.repeat(func, number=number, repeat=5)) / number / FRAMES * 1e6
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.tcap")
+        with CaptureWriter(path) as capture:
+            for name, chunk in (("pipelined", None), ("fragmented", 64)):
+                plain = per_frame(protocol_path(FRAMES, chunk))
+                captured = per_frame(protocol_path(FRAMES, chunk, capture=capture))
+                print(
+                    f"{name:<12} {plain:6.2f} us/frame, captured {captured:6.2f} "
+                    f"us/frame ({captured / plain - 1:+.1%})"
+                )
+        size = os.path.getsize(path)
+        reader = CaptureReader(path)
+        seconds = min(timeit.repeat(lambda: sum(1 for _ in reader), number=1))
+        chunks = sum(1 for _ in reader)
+        reader.close()
+        print(
+            f"read {chunks:,} chunks ({size / 1e6:.1f} MB) in {seconds * 1000:.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
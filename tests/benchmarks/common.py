@@ -0,0 +1,51 @@
+"""Shared helpers for benchmarks."""
+
+import asyncio
+
+from framework.main import Telematica
+from framework.utils import AVLDataResponse
+
+
+class FakeTransport(asyncio.Transport):
+    """In-memory transport collecting written bytes."""
+
+    def __init__(self, peername=("127.0.0.1", 50000)):
+        super().__init__()
+        self.peername = peername
+        self.written = bytearray()
+        self.closed = False
+
+    def get_extra_info(self, name, default=None):
+        if name == "peername":
+            return self.peername
+        return default
+
+    def write(self, data):
+        self.written += data
+
+    def pause_reading(self):
+        pass
+
+    def resume_reading(self):
+        pass
+
+    def is_closing(self) -> bool:
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+
+def make_app(**avl_options) -> Telematica:
+    """Telematica app accepting every login and acknowledging all records."""
+    app = Telematica()
+
+    @app.login()
+    async def login(login):
+        pass
+
+    @app.avl(**avl_options)
+    async def avl(avldata):
+        return AVLDataResponse(avldata.record_count)
+
+    return app
@@ -0,0 +1,60 @@
+"""Benchmark CRC-16 implementations.
+
+Compares the table-driven engine from `teltonika.crc` with the original
+bit-by-bit loop. Run from the repository root:
+
+    python -m tests.benchmarks.crc
+"""
+
+import os
+import timeit
+
+from teltonika.crc import CRC16, crc16, verify_many
+
+
+def crc16_bitwise(data: bytes) -> int:
+    """Reference bit-by-bit CRC-16-IBM (previous implementation)."""
+    crc = 0x0000
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            if crc & 1:
+                crc = (crc >> 1) ^ 0xA001
+            else:
+                crc >>= 1
+    return crc & 0xFFFF
+
+
+def incremental(data: bytes, chunk: int = 64) -> int:
+    """Feed data to the incremental CRC in chunks."""
+    crc = CRC16()
+    for i in range(0, len(data), chunk):
+        crc.update(data[i : i + chunk])
+    return crc.value
+
+
+def bench(name: str, func, data: bytes, number: int):
+    """Print throughput of func over data in bytes/sec."""
+    seconds = min(timeit.repeat(lambda: func(data), number=number, repeat=5))
+    rate = len(data) * number / seconds
+    print(f"{name:<12} {len(data):>6} B  {rate / 1_000_000:8.2f} MB/s")
+
+
+def main():
+    for size in (64, 1024, 16 * 1024):
+        data = os.urandom(size)
+        assert crc16(data) == crc16_bitwise(data) == incremental(data)
+        number = max(1, 200_000 // size)
+        bench("bitwise", crc16_bitwise, data, number)
+        bench("table", crc16, data, number * 4)
+        bench("incremental", incremental, data, number * 4)
+
+    frames = [(data, crc16(data)) for data in (os.urandom(1024) for _ in range(100))]
+    assert all(verify_many(frames))
+    seconds = min(timeit.repeat(lambda: verify_many(frames), number=10, repeat=5))
+    rate = 1024 * len(frames) * 10 / seconds
+    print(f"{'verify_many':<12} {len(frames):>4} fr  {rate / 1_000_000:8.2f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Check and benchmark deduplication of retransmitted AVL frames.
+
+First checks that a frame resent within one batch event is handled
+once, per packet and by a batch handler. Then measures the per-frame
+cost of checking and remembering new frames against decoding them, the
+cost of skipping a retransmitted frame, and the AVL path through
+Telematica with every other frame retransmitted, as happens when acks
+are lost. Run from the repository root:
+
+    python -m tests.benchmarks.dedup
+"""
+
+import asyncio
+import contextlib
+import timeit
+
+from framework.dedup import Deduplicator
+from framework.main import Telematica
+from framework.utils import AVLData, AVLDataResponse, Connection, LazyAVLData
+from teltonika.encoder import Record, encode_avl
+
+FRAMES = 1000
+RECORDS = 10
+IMEI = "123456789012345"
+
+
+def payloads() -> list[bytes]:
+    """Payloads of FRAMES frames with consecutive records."""
+    frames = []
+    for i in range(FRAMES):
+        start = 1_700_000_000_000 + i * RECORDS * 1000
+        records = [
+            Record(start + j * 1000, 54.6872, 25.2797, speed=50) for j in range(RECORDS)
+        ]
+        # Strip the frame header and CRC, as the protocol does.
+        frames.append(encode_avl(records)[8:-4])
+    return frames
+
+
+def per_frame(func) -> float:
+    """Microseconds per frame."""
+    return min(timeit.repeat(func, number=1, repeat=5)) / FRAMES * 1e6
+
+
+def make_app(dedup: Deduplicator | None) -> tuple[Telematica, list]:
+    """App keeping the position of every record it handles."""
+    app = Telematica()
+    handled = []
+
+    @app.avl(lazy=True, dedup=dedup)
+    async def avl(avldata):
+        for record in avldata.records:
+            handled.append((record.latitude, record.longitude))
+        return AVLDataResponse(avldata.record_count)
+
+    return app, handled
+
+
+def ack_batch(app: Telematica, frames: list[bytes]) -> list[int]:
+    """Dispatch frames as one batch event, return the acked record counts."""
+    acked = []
+
+    async def send(event):
+        acked.append(event["data"])
+
+    event = {"type": "teltonika.avl.batch", "data": frames}
+    # The ack is sent even if the handler raises.
+    with contextlib.suppress(RuntimeError):
+        asyncio.run(app._dispatch(event, send, Connection(imei=IMEI)))
+    return acked[0]
+
+
+def check_resent_in_batch(frame: bytes):
+    handled = []
+    per_packet, _ = make_app(Deduplicator())
+    batch = Telematica()
+
+    @batch.avl_batch(lazy=True, dedup=Deduplicator())
+    async def avl_batch(batch):
+        handled.extend(avldata.record_count for avldata in batch)
+        return [AVLDataResponse(avldata.record_count) for avldata in batch]
+
+    for app in (per_packet, batch):
+        acked = ack_batch(app, [frame, frame])
+        assert acked == [RECORDS, RECORDS], acked
+    assert handled == [RECORDS], handled
+
+    # The copy is not acked while the first frame was not handled in full.
+    failing = Telematica()
+    responses = [None, [AVLDataResponse(RECORDS - 1)], [AVLDataResponse(RECORDS)]]
+
+    @failing.avl_batch(lazy=True, dedup=Deduplicator())
+    async def fail(batch):
+        response = responses.pop(0)
+        if response is None:
+            raise RuntimeError("storage down")
+        return response
+
+    for expected in ([0, 0], [RECORDS - 1, 0], [RECORDS, RECORDS]):
+        acked = ack_batch(failing, [frame, frame])
+        assert acked == expected, (acked, expected)
+
+
+def main():
+    data = payloads()
+    check_resent_in_batch(data[0])
+    print("checks OK")
+
+    def check_new():
+        dedup = Deduplicator()
+        for payload in data:
+            dedup.commit(IMEI, dedup.check(IMEI, payload))
+
+    def check_retransmitted():
+        # Each frame is sent again right after it was handled.
+        dedup = Deduplicator()
+        for payload in data:
+            dedup.commit(IMEI, dedup.check(IMEI, payload))
+            dedup.check(IMEI, payload)
+
+    cases = {
+        "decode AVLData": lambda: [AVLData.from_bytes(p) for p in data],
+        "decode LazyAVLData": lambda: [LazyAVLData.from_bytes(p) for p in data],
+        "dedup new frame": check_new,
+        "dedup new+retransmitted": check_retransmitted,
+    }
+    print(f"{FRAMES} frames of {RECORDS} records")
+    for name, func in cases.items():
+        print(f"{name:<24} {per_frame(func):8.2f} us/frame")
+
+    # Every frame is sent twice, as if each first ack was lost.
+    events = [{"type": "teltonika.avl", "data": p} for p in data for _ in range(2)]
+    for name, dedup in (("no dedup", None), ("dedup", Deduplicator())):
+        app, handled = make_app(dedup)
+        connection = Connection(imei=IMEI)
+        acked = []
+
+        async def send(event):
+            acked.append(event["data"])
+
+        async def run():
+            for event in events:
+                await app._dispatch(event, send, connection)
+
+        loop = asyncio.new_event_loop()
+        elapsed = timeit.timeit(lambda: loop.run_until_complete(run()), number=1)
+        loop.close()
+        print(
+            f"retransmitting, {name:<9} {elapsed / len(events) * 1e6:8.2f} us/frame,"
+            f" {len(handled):,} records handled, {sum(acked):,} acked"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Check and benchmark the Teltonika encoder.
+
+First round-trips randomly generated records, with every IO group and
+field ranges at their limits, through `teltonika.encoder` and
+`framework.utils.AVLData.from_bytes` and the protocol framing. Then
+compares encoding speed with the previous concatenating emulator
+encoder. Run from the repository root:
+
+    python -m tests.benchmarks.encoder --cases 10000
+"""
+
+import argparse
+import datetime
+import random
+import struct
+import timeit
+
+from framework.utils import AVLData
+from teltonika import AVLPacket, LoginPacket, Teltonika
+from teltonika.crc import crc16
+from teltonika.encoder import (
+    NO_IO,
+    Record,
+    encode_avl,
+    encode_avl_many,
+    encode_login,
+    group_io,
+)
+
+FRAMES = 1000
+RECORDS = 10
+# Per IO group: (maximum value, maximum elements).
+IO_LIMITS = ((0xFF, 8), (0xFFFF, 8), (0xFFFFFFFF, 4), (0xFFFFFFFFFFFFFFFF, 4))
+
+
+def random_record(rng: random.Random) -> Record:
+    groups = []
+    for maximum, count in IO_LIMITS:
+        ids = rng.sample(range(256), rng.randint(0, count))
+        groups.append(
+            [
+                (io_id, rng.choice((0, maximum, rng.randint(0, maximum))))
+                for io_id in ids
+            ]
+        )
+    return Record(
+        timestamp=rng.randint(0, 4_102_444_800_000),
+        latitude=rng.randint(-900_000_000, 900_000_000) / 10_000_000,
+        longitude=rng.randint(-1_800_000_000, 1_800_000_000) / 10_000_000,
+        altitude=rng.randint(-0x8000, 0x7FFF),
+        angle=rng.randint(0, 360),
+        satellites=rng.randint(0, 0xFF),
+        speed=rng.randint(0, 0xFFFF),
+        priority=rng.randint(0, 2),
+        event_id=rng.randint(0, 0xFF),
+        io_elements=tuple(groups) if rng.random() < 0.8 else NO_IO,
+    )
+
+
+def check_record(record: Record, decoded):
+    expected_io = [
+        (io_id, io_type, value)
+        for io_type, group in enumerate(record.io_elements, start=1)
+        for io_id, value in group
+    ]
+    actual_io = [
+        (element["io_id"], element["io_type"], element["io_value"])
+        for element in decoded.io_elements
+    ]
+    timestamp = datetime.datetime.fromtimestamp(record.timestamp / 1000)
+    assert decoded.timestamp == timestamp.isoformat(), (record, decoded)
+    assert decoded.latitude == record.latitude, (record, decoded)
+    assert decoded.longitude == record.longitude, (record, decoded)
+    for name in ("altitude", "angle", "satellites", "speed", "priority", "event_id"):
+        assert getattr(decoded, name) == getattr(record, name), (name, record)
+    assert decoded.io_element_count == len(expected_io), record
+    assert actual_io == expected_io, record
+
+
+def round_trip(cases: int, seed: int):
+    """Encode random frames and check the decoder returns the same records."""
+    rng = random.Random(seed)
+    frames = [
+        [random_record(rng) for _ in range(rng.choice((1, 2, rng.randint(1, 255))))]
+        for _ in range(cases)
+    ]
+    encoded = encode_avl_many(frames)
+    connection = Teltonika()
+    connection.receive_data(encode_login("123456789012345"))
+    assert isinstance(connection.next_event(), LoginPacket)
+    for records, frame in zip(frames, encoded):
+        assert bytes(frame) == encode_avl(records)
+        connection.receive_data(frame)
+        event = connection.next_event()
+        assert isinstance(event, AVLPacket), event
+        data = AVLData.from_bytes(event.data)
+        assert data.record_count == len(records)
+        # Trailing record count as required by Codec 8.
+        assert event.data[-1] == len(records)
+        for record, decoded in zip(records, data.records):
+            check_record(record, decoded)
+
+    assert group_io({1: 0, 2: 0x100, 3: 0x10000, 4: 1 << 32}) == (
+        [(1, 0)],
+        [(2, 0x100)],
+        [(3, 0x10000)],
+        [(4, 1 << 32)],
+    )
+    print(f"round trip: {cases} frames, {sum(map(len, frames))} records OK")
+
+
+def legacy_record(timestamp, lat, lon, speed, io_elements) -> bytes:
+    """Previous emulator record encoder."""
+    record = b""
+    record += struct.pack(">Q", timestamp)
+    record += struct.pack("B", 0)
+    record += struct.pack(">i", int(lon * 10_000_000))
+    record += struct.pack(">i", int(lat * 10_000_000))
+    record += struct.pack(">H", 100)
+    record += struct.pack(">H", 0)
+    record += struct.pack("B", 5)
+    record += struct.pack(">H", speed)
+    record += struct.pack("B", 0)
+    record += struct.pack("B", len(io_elements))
+    for size in (1, 2, 4, 8):
+        record += struct.pack("B", 0)
+    return record
+
+
+def legacy_frame(records: list[bytes]) -> bytes:
+    """Previous emulator frame encoder."""
+    data = struct.pack("B", 0x08)
+    data += struct.pack("B", len(records))
+    data += b"".join(records)
+    data += struct.pack("B", len(records))
+    crc = struct.pack(">I", crc16(data))
+    return b"\x00\x00\x00\x00" + struct.pack(">I", len(data)) + data + crc
+
+
+def benchmark():
+    positions = [
+        (1_700_000_000_000 + i, 54.6872 + i * 1e-5, 25.2797 + i * 1e-5, 50)
+        for i in range(FRAMES * RECORDS)
+    ]
+    frames = [
+        [
+            Record(timestamp, lat, lon, altitude=100, satellites=5, speed=speed)
+            for timestamp, lat, lon, speed in positions[i : i + RECORDS]
+        ]
+        for i in range(0, len(positions), RECORDS)
+    ]
+    io = group_io({1: 1, 21: 4, 66: 12_500, 241: 24_602})
+    io_frames = [[record._replace(io_elements=io) for record in f] for f in frames]
+
+    def legacy():
+        for i in range(0, len(positions), RECORDS):
+            legacy_frame(
+                [
+                    legacy_record(timestamp, lat, lon, speed, {})
+                    for timestamp, lat, lon, speed in positions[i : i + RECORDS]
+                ]
+            )
+
+    cases = {
+        "legacy": legacy,
+        "encode_avl": lambda: [encode_avl(records) for records in frames],
+        "encode_avl_many": lambda: encode_avl_many(frames),
+        "encode_avl_many+io": lambda: encode_avl_many(io_frames),
+    }
+    print(f"{FRAMES} frames of {RECORDS} records")
+    for name, func in cases.items():
+        seconds = min(timeit.repeat(func, number=1, repeat=5))
+        print(f"{name:<20} {FRAMES / seconds:>12,.0f} frames/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m tests.benchmarks.encoder")
+    parser.add_argument("--cases", type=int, default=2000, help="frames to check")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    round_trip(args.cases, args.seed)
+    benchmark()
+
+
+if __name__ == "__main__":
+    main()
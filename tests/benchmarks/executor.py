@@ -0,0 +1,112 @@
+"""Benchmark event loop latency with CPU-heavy AVL handlers.
+
+Drives several connections through TeltonikaProtocol while a probe task
+measures how late the event loop wakes it up. The handler does either
+GIL-releasing work (zlib compression) or pure Python work, inline on
+the loop or offloaded with @app.avl(executor=...). Run from the
+repository root:
+
+    python -m tests.benchmarks.executor
+"""
+
+import asyncio
+import statistics
+import time
+import zlib
+
+from framework.main import Telematica
+from framework.utils import AVLDataResponse
+from protocol_server.server import TeltonikaProtocol
+from tests.benchmarks.common import FakeTransport
+from tests.emulator.run import create_codec8_message, create_imei_packet
+
+CONNECTIONS = 8
+FRAMES = 20
+PROBE_INTERVAL = 0.001
+BLOB = bytes(range(256)) * 4096
+
+
+def compress(avldata):
+    zlib.compress(BLOB, 9)
+    return AVLDataResponse(avldata.record_count)
+
+
+def python(avldata):
+    sum(i * i for i in range(100_000))
+    return AVLDataResponse(avldata.record_count)
+
+
+def make_app(work, executor: str | None) -> Telematica:
+    app = Telematica()
+
+    @app.login()
+    async def login(login):
+        pass
+
+    if executor is None:
+
+        async def inline(avldata):
+            return work(avldata)
+
+        app.avl(lazy=True)(inline)
+    else:
+        app.avl(lazy=True, executor=executor, max_workers=4)(work)
+    return app
+
+
+async def probe(stop: asyncio.Event, lags: list[float]):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - started - PROBE_INTERVAL)
+
+
+async def run(app: Telematica) -> tuple[float, list[float]]:
+    data = create_imei_packet("123456789012345") + b"".join(
+        create_codec8_message(timestamp=1_700_000_000_000 + i) for i in range(FRAMES)
+    )
+    stop = asyncio.Event()
+    lags: list[float] = []
+    probe_task = asyncio.create_task(probe(stop, lags))
+    await asyncio.sleep(PROBE_INTERVAL)
+
+    started = time.perf_counter()
+    transports = []
+    for i in range(CONNECTIONS):
+        protocol = TeltonikaProtocol(app)
+        transport = FakeTransport(("127.0.0.1", 50000 + i))
+        protocol.connection_made(transport)
+        protocol.data_received(data)
+        transports.append(transport)
+
+    while any(len(t.written) < FRAMES + 1 for t in transports):
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+    return elapsed, lags
+
+
+def main():
+    print(f"{CONNECTIONS} connections x {FRAMES} frames, loop lag in ms")
+    for work in (compress, python):
+        for executor in (None, "thread", "process"):
+            app = make_app(work, executor)
+            if executor is not None:
+                # Start the pool workers before measuring.
+                asyncio.run(run(app))
+            elapsed, lags = asyncio.run(run(app))
+            for pool in app.executors.values():
+                pool.shutdown()
+            lags.sort()
+            print(
+                f"  {work.__name__:<8} {executor or 'inline':<8}"
+                f" p50 {statistics.median(lags) * 1000:6.2f}"
+                f" p99 {lags[int(len(lags) * 0.99)] * 1000:6.2f}"
+                f" max {lags[-1] * 1000:6.2f}"
+                f"  {CONNECTIONS * FRAMES / elapsed:8.0f} frames/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Benchmark the fleet state store.
+
+Measures memory per vehicle and update/snapshot speed of the array
+backed `Fleet` with 100k vehicles, compared with a dict of `Vehicle`
+objects. Run from the repository root:
+
+    python -m tests.benchmarks.fleet
+"""
+
+import gc
+import timeit
+import tracemalloc
+
+from application.data import Fleet, Vehicle
+from framework.utils import LazyAVLData
+from tests.benchmarks.avl_decode import payload
+
+VEHICLES = 100_000
+IMEIS = [str(350_000_000_000_000 + i) for i in range(VEHICLES)]
+RECORD = LazyAVLData.from_bytes(payload(0)).records[0]
+
+
+def fill_fleet() -> Fleet:
+    fleet = Fleet()
+    for imei in IMEIS:
+        fleet.update(imei, RECORD)
+    return fleet
+
+
+def fill_dict() -> dict[str, Vehicle]:
+    vehicles = {}
+    for imei in IMEIS:
+        vehicles[imei] = Vehicle(
+            RECORD.latitude,
+            RECORD.longitude,
+            RECORD.altitude,
+            RECORD.angle,
+            RECORD.speed,
+        )
+    return vehicles
+
+
+def fill_fleet_update(fleet: Fleet):
+    update = fleet.update
+    for imei in IMEIS:
+        update(imei, RECORD)
+
+
+def memory_per_vehicle(fill) -> float:
+    """Bytes allocated per vehicle, excluding the IMEI strings themselves."""
+    gc.collect()
+    tracemalloc.start()
+    store = fill()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del store
+    return size / VEHICLES
+
+
+def main():
+    print(f"{VEHICLES:,} vehicles")
+    for name, fill in (("fleet", fill_fleet), ("dict of Vehicle", fill_dict)):
+        print(f"  {name:<16} {memory_per_vehicle(fill):8.1f} bytes/vehicle")
+
+    fleet = fill_fleet()
+    seconds = min(timeit.repeat(lambda: fill_fleet_update(fleet), number=1, repeat=5))
+    print(f"  update           {VEHICLES / seconds:>12,.0f} updates/s")
+    seconds = min(timeit.repeat(lambda: list(fleet.positions()), number=1, repeat=5))
+    print(f"  positions        {seconds * 1000:8.1f} ms per snapshot")
+    seconds = min(timeit.repeat(lambda: fleet.evict(3600), number=1, repeat=5))
+    print(f"  evict (none)     {seconds * 1000:8.1f} ms per sweep")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Check and benchmark the Teltonika framing buffer.
+
+First checks that a login followed by AVL frames in one segment is
+delivered and acknowledged without waiting for more data, that the
+reject of a corrupted frame follows the acks of earlier frames, and that
+the buffer is compacted in place once payload views are released. Then
+times receiving a long stream in small segments, with payload views
+released right away and kept alive. Run from the repository root:
+
+    python -m tests.benchmarks.framing
+"""
+
+import asyncio
+import timeit
+from collections import deque
+
+from protocol_server.server import TeltonikaProtocol
+from teltonika import AVLPacket, LoginPacket, Teltonika
+from tests.benchmarks.common import FakeTransport, make_app
+from tests.emulator.run import create_codec8_message, create_imei_packet
+
+IMEI_PACKET = create_imei_packet("123456789012345")
+FRAME = create_codec8_message(timestamp=1_700_000_000_000)
+CORRUPT_FRAME = FRAME[:-1] + bytes([FRAME[-1] ^ 0xFF])
+FRAMES = 10_000
+
+
+def written(data: bytes, **options) -> bytes:
+    """Bytes a protocol writes after receiving data in one segment."""
+
+    async def run():
+        protocol = TeltonikaProtocol(make_app(), **options)
+        transport = FakeTransport()
+        protocol.connection_made(transport)
+        protocol.data_received(data)
+        for _ in range(100):
+            await asyncio.sleep(0)
+        protocol.connection_lost(None)
+        return bytes(transport.written)
+
+    return asyncio.run(run())
+
+
+def check_login_and_avl_in_one_segment():
+    connection = Teltonika()
+    connection.receive_data(IMEI_PACKET + FRAME + FRAME)
+    events = [type(event) for event in connection.events()]
+    assert events == [LoginPacket, AVLPacket, AVLPacket], events
+    result = written(IMEI_PACKET + FRAME + FRAME)
+    assert result == b"\x01\x01\x01", result
+
+
+def check_reject_order():
+    for options in ({}, {"max_batch_size": 8}, {"connection_scope": True}):
+        result = written(IMEI_PACKET + FRAME + CORRUPT_FRAME, **options)
+        assert result == b"\x01\x01\x00", (options, result)
+
+
+def check_compaction():
+    connection = Teltonika()
+    connection.receive_data(IMEI_PACKET)
+    connection.next_event()
+    buffer = connection._buffer
+    for _ in range(2 * Teltonika.COMPACT_THRESHOLD // len(FRAME)):
+        connection.receive_data(FRAME)
+        # Consume events without keeping a reference to the last one.
+        deque(connection.events(), maxlen=0)
+    assert connection._buffer is buffer, "buffer was copied"
+    assert len(buffer) <= Teltonika.COMPACT_THRESHOLD + len(FRAME), "not compacted"
+
+
+def receive(keep_views: bool):
+    connection = Teltonika()
+    connection.receive_data(IMEI_PACKET)
+    connection.next_event()
+    kept = deque(maxlen=None if keep_views else 0)
+    for _ in range(FRAMES):
+        connection.receive_data(FRAME)
+        kept.extend(event.data for event in connection.events())
+
+
+def main():
+    check_login_and_avl_in_one_segment()
+    check_reject_order()
+    check_compaction()
+    print("checks OK")
+    for name, keep_views in (("views released", False), ("views kept", True)):
+        seconds = min(timeit.repeat(lambda: receive(keep_views), number=1, repeat=5))
+        print(f"{name:<16} {FRAMES / seconds:>12,.0f} frames/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark per-frame logging overhead on the ingest path.
+
+Compares the previous eagerly formatted debug calls with the lazy,
+rate-limited connection logger, with DEBUG disabled and enabled, and
+with records written directly or through the queue listener thread.
+Output goes to os.devnull. Run from the repository root:
+
+    python -m tests.benchmarks.logs
+"""
+
+import logging
+import os
+import queue
+import timeit
+from logging.handlers import QueueListener
+
+from protocol_server.logs import ConnectionLogger, LazyQueueHandler
+from tests.benchmarks.__main__ import FRAME, protocol_path
+
+LOGGER = logging.getLogger("protocol_server.server")
+EVENT = {"type": "teltonika.avl", "data": memoryview(FRAME)}
+ACK = {"type": "teltonika.avl.accept", "data": 1}
+FRAMES = 100
+
+
+def eager():
+    """Debug calls made for each frame before this change."""
+    logging.debug("Raw data received: {}".format(FRAME))
+    LOGGER.debug("Queuing event: {}".format(EVENT))
+    LOGGER.debug("Send event: {}".format(ACK))
+
+
+def lazy(log: ConnectionLogger):
+    log.debug("Raw data received: %r", FRAME)
+    log.debug("Queuing event: %s", EVENT["type"])
+    log.debug("Send event: %s", ACK)
+
+
+def configure(level: int, queued: bool) -> QueueListener | None:
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.setLevel(level)
+    stream = logging.StreamHandler(open(os.devnull, "w"))
+    stream.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    if not queued:
+        root.addHandler(stream)
+        return None
+    log_queue = queue.SimpleQueue()
+    root.addHandler(LazyQueueHandler(log_queue))
+    listener = QueueListener(log_queue, stream)
+    listener.start()
+    return listener
+
+
+def per_frame(func) -> float:
+    """Microseconds per call."""
+    number = 20_000
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    unlimited = ConnectionLogger(LOGGER, ("127.0.0.1", 50000), rate=1e9, burst=1e9)
+    sampled = ConnectionLogger(LOGGER, ("127.0.0.1", 50000))
+    protocol = protocol_path(FRAMES, None)
+
+    print("logging calls per frame, us")
+    for name, level, queued, func in (
+        ("eager, DEBUG off", logging.INFO, False, eager),
+        ("lazy, DEBUG off", logging.INFO, False, lambda: lazy(unlimited)),
+        ("eager, DEBUG on, direct", logging.DEBUG, False, eager),
+        ("lazy, DEBUG on, direct", logging.DEBUG, False, lambda: lazy(unlimited)),
+        ("lazy, DEBUG on, queued", logging.DEBUG, True, lambda: lazy(unlimited)),
+        ("sampled, DEBUG on, queued", logging.DEBUG, True, lambda: lazy(sampled)),
+    ):
+        listener = configure(level, queued)
+        print(f"  {name:<28} {per_frame(func):8.2f}")
+        if listener is not None:
+            listener.stop()
+
+    print("protocol path, frames/s")
+    for name, level, queued in (
+        ("DEBUG off", logging.INFO, False),
+        ("DEBUG on, sampled, queued", logging.DEBUG, True),
+    ):
+        listener = configure(level, queued)
+        seconds = min(timeit.repeat(protocol, number=20, repeat=5)) / 20
+        print(f"  {name:<28} {FRAMES / seconds:>8,.0f}")
+        if listener is not None:
+            listener.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Benchmark the grid spatial index.
+
+Measures updates/sec of 100k vehicles moving around a country-sized
+area and the latency of viewport, radius and cluster queries. Run from
+the repository root:
+
+    python -m tests.benchmarks.spatial
+"""
+
+import random
+import statistics
+import time
+
+from application.spatial import GridIndex
+
+VEHICLES = 100_000
+# Vehicles are spread over roughly the Czech Republic.
+SOUTH, WEST, NORTH, EAST = 48.5, 12.0, 51.0, 18.9
+QUERIES = 200
+
+
+def latency(query, boxes) -> tuple[float, float]:
+    """Median and p99 latency in milliseconds."""
+    latencies = []
+    for box in boxes:
+        started = time.perf_counter()
+        query(*box)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.99)]
+
+
+def viewport(lat_span: float, lng_span: float) -> tuple[float, float, float, float]:
+    south = random.uniform(SOUTH, NORTH - lat_span)
+    west = random.uniform(WEST, EAST - lng_span)
+    return south, west, south + lat_span, west + lng_span
+
+
+def main():
+    index = GridIndex()
+    imeis = [str(350_000_000_000_000 + i) for i in range(VEHICLES)]
+    positions = [
+        [random.uniform(SOUTH, NORTH), random.uniform(WEST, EAST)] for _ in imeis
+    ]
+    for imei, (lat, lng) in zip(imeis, positions):
+        index.update(imei, lat, lng)
+
+    moves = []
+    for imei, position in zip(imeis, positions):
+        position[0] += random.uniform(-0.001, 0.001)
+        position[1] += random.uniform(-0.001, 0.001)
+        moves.append((imei, position[0], position[1]))
+    update = index.update
+    started = time.perf_counter()
+    for imei, lat, lng in moves:
+        update(imei, lat, lng)
+    rate = VEHICLES / (time.perf_counter() - started)
+    print(f"{VEHICLES:,} vehicles, {len(index.cells):,} occupied cells")
+    print(f"  update                {rate:>12,.0f} updates/s")
+
+    for name, query, boxes in (
+        ("bbox city", index.bbox, [viewport(0.2, 0.3) for _ in range(QUERIES)]),
+        ("bbox region", index.bbox, [viewport(1.0, 1.5) for _ in range(QUERIES)]),
+        (
+            "radius 2 km",
+            index.radius,
+            [(*viewport(0, 0)[:2], 2000) for _ in range(QUERIES)],
+        ),
+        (
+            "clusters country z7",
+            index.clusters,
+            [(SOUTH, WEST, NORTH, EAST, 7)] * QUERIES,
+        ),
+        (
+            "clusters region z10",
+            index.clusters,
+            [(*viewport(1.0, 1.5), 10) for _ in range(QUERIES)],
+        ),
+    ):
+        p50, p99 = latency(query, boxes)
+        print(f"  {name:<20}  p50 {p50:7.3f} ms  p99 {p99:7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
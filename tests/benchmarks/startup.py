@@ -0,0 +1,97 @@
+"""Benchmark protocol server startup time and memory per mode.
+
+Starts `python -m protocol_server --mode MODE` on free ports, measures the
+time until the served ports accept connections and the resident memory
+of the server process (Linux only), then stops it with SIGINT. Servers
+run in a temporary directory so database files stay out of the tree.
+Run from the repository root:
+
+    python -m tests.benchmarks.startup
+"""
+
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ("tcp", "http", "all")
+TIMEOUT = 60.0
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def accepting(port: int) -> bool:
+    try:
+        socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+    except OSError:
+        return False
+    return True
+
+
+def rss(pid: int) -> int:
+    """Resident set size of a process in KiB."""
+    with open(f"/proc/{pid}/status", encoding="ascii") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def start(mode: str, cwd: str) -> tuple[float, int]:
+    """Return seconds until the server accepts connections and its RSS."""
+    tcp_port, http_port = free_port(), free_port()
+    ports = {"tcp": [tcp_port], "http": [http_port], "all": [tcp_port, http_port]}
+    command = [
+        sys.executable,
+        "-m",
+        "protocol_server",
+        f"--mode={mode}",
+        f"--tcp-port={tcp_port}",
+        f"--http-port={http_port}",
+    ]
+    env = {**os.environ, "PYTHONPATH": os.getcwd()}
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        command, cwd=cwd, env=env, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL
+    )
+    try:
+        while not all(accepting(port) for port in ports[mode]):
+            if process.poll() is not None:
+                raise RuntimeError(f"{mode} server exited with {process.returncode}")
+            if time.perf_counter() - started > TIMEOUT:
+                raise TimeoutError(f"{mode} server did not start")
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        return elapsed, rss(process.pid)
+    finally:
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(TIMEOUT)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m tests.benchmarks.startup")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cwd:
+        for mode in MODES:
+            runs = [start(mode, cwd) for _ in range(args.repeat)]
+            elapsed = min(run[0] for run in runs)
+            memory = min(run[1] for run in runs)
+            print(f"{mode:<6} {elapsed:8.2f} s {memory / 1024:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
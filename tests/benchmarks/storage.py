@@ -0,0 +1,122 @@
+"""Benchmark the write-behind telemetry store.
+
+Measures sustained records/sec written through `TelemetryStore.add` and
+the latency of one-hour track history queries on a database of --rows
+records spread over --vehicles vehicles. Filling 100M rows takes a
+while and about 5 GB of disk. Run from the repository root:
+
+    python -m tests.benchmarks.storage --rows 100000000 --path /tmp/bench.db
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+from application.storage import INSERT, TelemetryStore, connect
+from framework.utils import LazyAVLData
+from tests.emulator.run import encode_codec8_avl_record
+
+IMEI_BASE = 350_000_000_000_000
+START_MS = 1_700_000_000_000
+# Each vehicle reports every INTERVAL_MS.
+INTERVAL_MS = 10_000
+HOUR_MS = 3_600_000
+
+
+def records(count: int) -> list:
+    """Lazy records with distinct timestamps."""
+    return [
+        LazyAVLData.from_bytes(
+            b"\x08\x01"
+            + encode_codec8_avl_record(timestamp=START_MS + i * INTERVAL_MS)
+            + b"\x01"
+        ).records[0]
+        for i in range(count)
+    ]
+
+
+def fill(path: str, rows: int, vehicles: int):
+    """Insert rows directly, in primary key order per batch."""
+    db = connect(path)
+    existing = db.execute("SELECT count(*) FROM records").fetchone()[0]
+    if existing >= rows:
+        print(f"using {existing:,} existing rows")
+        return
+    per_vehicle = rows // vehicles
+    started = time.perf_counter()
+    for vehicle in range(vehicles):
+        imei = IMEI_BASE + vehicle
+        with db:
+            db.executemany(
+                INSERT,
+                (
+                    (imei, START_MS + i * INTERVAL_MS, 54.0, 25.0, 100, 0, 10, 50)
+                    for i in range(per_vehicle)
+                ),
+            )
+    elapsed = time.perf_counter() - started
+    print(f"filled {per_vehicle * vehicles:,} rows in {elapsed:.1f} s")
+    db.close()
+
+
+async def sustained_writes(path: str, count: int, vehicles: int) -> float:
+    """Records/sec written through the write-behind queue."""
+    store = TelemetryStore(path)
+    await store.start()
+    # Every (IMEI, timestamp) pair is unique, up to 1M records.
+    imeis = [str(IMEI_BASE + vehicles + i) for i in range(1000)]
+    reports = records(1000)
+    started = time.perf_counter()
+    for i in range(count):
+        store.add(imeis[i % 1000], reports[i // 1000 % 1000])
+        if i % 1000 == 999:
+            # Let the writer run, like the event loop would between packets.
+            await asyncio.sleep(0)
+    await store.close()
+    return count / (time.perf_counter() - started)
+
+
+async def query_latency(path: str, rows: int, vehicles: int, queries: int):
+    store = TelemetryStore(path)
+    span = rows // vehicles * INTERVAL_MS
+    latencies = []
+    for _ in range(queries):
+        imei = str(IMEI_BASE + random.randrange(vehicles))
+        start = START_MS + random.randrange(max(1, span - HOUR_MS))
+        started = time.perf_counter()
+        await store.history(imei, start, start + HOUR_MS)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m tests.benchmarks.storage")
+    parser.add_argument("--path", default="bench-telemetry.db")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--vehicles", type=int, default=1000)
+    parser.add_argument("--writes", type=int, default=500_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--keep", action="store_true", help="keep the database")
+    args = parser.parse_args()
+
+    try:
+        fill(args.path, args.rows, args.vehicles)
+        rate = asyncio.run(sustained_writes(args.path, args.writes, args.vehicles))
+        print(f"write-behind      {rate:>12,.0f} records/s")
+        p50, p99 = asyncio.run(
+            query_latency(args.path, args.rows, args.vehicles, args.queries)
+        )
+        print(f"1h history query  p50 {p50 * 1000:.2f} ms  p99 {p99 * 1000:.2f} ms")
+    finally:
+        if not args.keep:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(args.path + suffix):
+                    os.remove(args.path + suffix)
+
+
+if __name__ == "__main__":
+    main()
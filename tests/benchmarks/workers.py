@@ -0,0 +1,95 @@
+"""Load test TCP ingest with a growing number of worker processes.
+
+Starts the Supervisor with 1, 2, 4... workers and drives it from
+several client processes, each holding many pipelined connections.
+Reports acknowledged frames/sec per worker count. Run from the
+repository root:
+
+    python -m tests.benchmarks.workers --workers 1 2 4
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import time
+
+from framework.main import Telematica
+from framework.utils import AVLDataResponse
+from protocol_server.workers import Supervisor
+from tests.emulator.run import create_codec8_message, create_imei_packet
+
+HOST, PORT = "127.0.0.1", 18081
+APP_PATH = "tests/benchmarks/workers.py:app"
+
+app = Telematica()
+
+
+@app.login()
+async def login(login):
+    pass
+
+
+@app.avl()
+async def avl(avldata):
+    return AVLDataResponse(avldata.record_count)
+
+
+async def connection(frames: int, window: int) -> int:
+    """Log in and send frames, keeping up to window frames unacknowledged."""
+    reader, writer = await asyncio.open_connection(HOST, PORT)
+    writer.write(create_imei_packet("123456789012345"))
+    await reader.readexactly(1)
+    frame = create_codec8_message(timestamp=1_700_000_000_000)
+    acked = 0
+    while acked < frames:
+        batch = min(window, frames - acked)
+        writer.write(frame * batch)
+        await reader.readexactly(batch)  # one byte ack per frame
+        acked += batch
+    writer.close()
+    return acked
+
+
+def client(connections: int, frames: int, window: int) -> int:
+    """Client process entrypoint."""
+
+    async def run():
+        results = await asyncio.gather(
+            *(connection(frames, window) for _ in range(connections))
+        )
+        return sum(results)
+
+    return asyncio.run(run())
+
+
+def load(clients: int, connections: int, frames: int, window: int) -> float:
+    """Return acknowledged frames/sec."""
+    with multiprocessing.get_context("spawn").Pool(clients) as pool:
+        start = time.perf_counter()
+        acked = sum(pool.starmap(client, [(connections, frames, window)] * clients))
+        elapsed = time.perf_counter() - start
+    return acked / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--connections", type=int, default=50)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--window", type=int, default=10)
+    args = parser.parse_args()
+
+    for workers in args.workers:
+        supervisor = Supervisor(APP_PATH, HOST, PORT, workers)
+        supervisor.start()
+        time.sleep(2)  # let workers import and bind
+        try:
+            rate = load(args.clients, args.connections, args.frames, args.window)
+        finally:
+            supervisor.stop()
+        print(f"workers={workers:<3} {rate:>12,.0f} frames/s")
+
+
+if __name__ == "__main__":
+    main()
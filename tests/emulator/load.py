@@ -0,0 +1,245 @@
+"""Asyncio fleet load generator.
+
+Simulates many concurrent vehicles, each with its own connection and
+IMEI, sending Codec 8 packets built with `teltonika.encoder`.
+Reports throughput, ack latency percentiles and error counts. Run from
+the repository root against a running protocol server:
+
+    python -m tests.emulator.load --vehicles 2000 --records 10 --rate 1 \\
+        --pipeline 4 --fragment random:64 --storm-interval 10 --duration 60
+
+Use --imei to make all vehicles log in with the same (known) IMEI.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import socket
+import time
+from array import array
+from collections import Counter, deque
+
+from teltonika.encoder import Record, encode_avl, encode_login
+
+IMEI_BASE = 350_000_000_000_000
+
+
+class Stats:
+    """Load test counters and ack latencies."""
+
+    def __init__(self):
+        self.latencies = array("d")
+        self.packets = 0
+        self.records = 0
+        self.connections = 0
+        self.errors: Counter[str] = Counter()
+
+    def percentile(self, sorted_latencies: list[float], q: float) -> float:
+        if not sorted_latencies:
+            return float("nan")
+        index = min(len(sorted_latencies) - 1, int(q * len(sorted_latencies)))
+        return sorted_latencies[index]
+
+    def summary(self, elapsed: float) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            "elapsed": elapsed,
+            "connections": self.connections,
+            "packets": self.packets,
+            "records": self.records,
+            "packets_per_sec": self.packets / elapsed,
+            "records_per_sec": self.records / elapsed,
+            "latency_ms": {
+                name: self.percentile(latencies, q) * 1000
+                for name, q in (("p50", 0.5), ("p99", 0.99), ("p999", 0.999))
+            },
+            "errors": dict(self.errors),
+        }
+
+
+def fragments(data: bytes, pattern: str) -> list[bytes]:
+    """Split data according to pattern: none, fixed:N or random:MAX."""
+    if pattern == "none":
+        return [data]
+    kind, _, size = pattern.partition(":")
+    size = int(size)
+    chunks = []
+    i = 0
+    while i < len(data):
+        step = size if kind == "fixed" else random.randint(1, size)
+        chunks.append(data[i : i + step])
+        i += step
+    return chunks
+
+
+class Vehicle:
+    """One simulated vehicle reconnecting until the test ends."""
+
+    def __init__(self, imei: str, args: argparse.Namespace, stats: Stats):
+        self.imei = imei
+        self.args = args
+        self.stats = stats
+        self.reconnect = asyncio.Event()
+        self.lat = 54.6872 + random.uniform(-0.5, 0.5)
+        self.lon = 25.2797 + random.uniform(-0.5, 0.5)
+
+    def packet(self) -> bytes:
+        timestamp = int(time.time() * 1000)
+        records = []
+        for i in range(self.args.records):
+            self.lat += random.uniform(-1e-4, 1e-4)
+            self.lon += random.uniform(-1e-4, 1e-4)
+            records.append(
+                Record(timestamp + i, self.lat, self.lon, satellites=5, speed=50)
+            )
+        return encode_avl(records)
+
+    async def run(self, stop: asyncio.Event):
+        while not stop.is_set():
+            self.reconnect.clear()
+            try:
+                await self.session(stop)
+            except (ConnectionError, asyncio.IncompleteReadError) as exc:
+                self.stats.errors[type(exc).__name__] += 1
+                await asyncio.sleep(self.args.reconnect_delay)
+            except TimeoutError:
+                self.stats.errors["ack_timeout"] += 1
+                await asyncio.sleep(self.args.reconnect_delay)
+            except OSError as exc:
+                self.stats.errors[f"os_error_{exc.errno}"] += 1
+                await asyncio.sleep(self.args.reconnect_delay)
+
+    async def session(self, stop: asyncio.Event):
+        reader, writer = await asyncio.open_connection(self.args.host, self.args.port)
+        writer.get_extra_info("socket").setsockopt(
+            socket.IPPROTO_TCP, socket.TCP_NODELAY, 1
+        )
+        self.stats.connections += 1
+        try:
+            await self.send(writer, encode_login(self.imei))
+            login = await asyncio.wait_for(reader.readexactly(1), self.args.timeout)
+            if login != b"\x01":
+                self.stats.errors["login_rejected"] += 1
+                await asyncio.sleep(self.args.reconnect_delay)
+                return
+
+            sent: deque[float] = deque()
+            window = asyncio.Semaphore(self.args.pipeline)
+            tasks = {
+                asyncio.create_task(self.send_packets(writer, sent, window, stop)),
+                asyncio.create_task(self.read_acks(reader, sent, window)),
+            }
+            try:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+            for task in done:
+                if not task.cancelled() and task.exception():
+                    raise task.exception()
+        finally:
+            writer.close()
+
+    async def send_packets(self, writer, sent, window, stop: asyncio.Event):
+        interval = 1 / self.args.rate if self.args.rate else 0
+        next_send = time.monotonic()
+        while not stop.is_set() and not self.reconnect.is_set():
+            await window.acquire()
+            if interval:
+                next_send += interval
+                await asyncio.sleep(max(0.0, next_send - time.monotonic()))
+            sent.append(time.perf_counter())
+            await self.send(writer, self.packet())
+
+    async def read_acks(self, reader, sent: deque, window: asyncio.Semaphore):
+        while True:
+            ack = await asyncio.wait_for(reader.readexactly(1), self.args.timeout)
+            latency = time.perf_counter() - sent.popleft()
+            window.release()
+            if ack[0] != self.args.records:
+                self.stats.errors["nack"] += 1
+                continue
+            self.stats.latencies.append(latency)
+            self.stats.packets += 1
+            self.stats.records += self.args.records
+
+    async def send(self, writer, data: bytes):
+        for chunk in fragments(data, self.args.fragment):
+            writer.write(chunk)
+            await writer.drain()
+
+
+async def reconnect_storms(vehicles: list[Vehicle], args, stop: asyncio.Event):
+    """Periodically make a fraction of the fleet reconnect at once."""
+    while not stop.is_set():
+        await asyncio.sleep(args.storm_interval)
+        for vehicle in random.sample(
+            vehicles, int(len(vehicles) * args.storm_fraction)
+        ):
+            vehicle.reconnect.set()
+
+
+async def main(args: argparse.Namespace) -> dict:
+    stats = Stats()
+    stop = asyncio.Event()
+    vehicles = [
+        Vehicle(args.imei or str(IMEI_BASE + i), args, stats)
+        for i in range(args.vehicles)
+    ]
+
+    async def start(vehicle: Vehicle, delay: float):
+        await asyncio.sleep(delay)
+        await vehicle.run(stop)
+
+    tasks = [
+        asyncio.create_task(start(vehicle, args.ramp * i / len(vehicles)))
+        for i, vehicle in enumerate(vehicles)
+    ]
+    if args.storm_interval:
+        tasks.append(asyncio.create_task(reconnect_storms(vehicles, args, stop)))
+
+    started = time.perf_counter()
+    await asyncio.sleep(args.duration)
+    stop.set()
+    elapsed = time.perf_counter() - started
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return stats.summary(elapsed)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m tests.emulator.load")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--vehicles", type=int, default=100)
+    parser.add_argument("--imei", help="IMEI used by all vehicles")
+    parser.add_argument("--records", type=int, default=1, help="records per packet")
+    parser.add_argument(
+        "--rate", type=float, default=1.0, help="packets/sec per vehicle, 0 = max"
+    )
+    parser.add_argument(
+        "--pipeline", type=int, default=1, help="unacknowledged packets per vehicle"
+    )
+    parser.add_argument(
+        "--fragment", default="none", help="none, fixed:N or random:MAX bytes"
+    )
+    parser.add_argument("--storm-interval", type=float, default=0.0)
+    parser.add_argument("--storm-fraction", type=float, default=0.5)
+    parser.add_argument("--reconnect-delay", type=float, default=1.0)
+    parser.add_argument("--ramp", type=float, default=1.0, help="seconds to connect")
+    parser.add_argument("--timeout", type=float, default=10.0, help="ack timeout")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--json", help="write summary as JSON to this file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    summary = asyncio.run(main(args))
+    print(json.dumps(summary, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
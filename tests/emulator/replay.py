@@ -0,0 +1,198 @@
+"""Replay captured sessions against a protocol server.
+
+Reads capture files written by `python -m protocol_server --capture DIR`
+through mmap and replays every captured connection on its own socket.
+Chunks are sent one write at a time, so the original fragmentation is
+kept, at the original pace (--speed 1), N times faster (--speed N) or
+as fast as possible (--speed 0). Reports throughput and error counts.
+Run from the repository root against a running protocol server:
+
+    python -m tests.emulator.replay captures/*.tcap --speed 10
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import time
+import traceback
+from collections import Counter
+from dataclasses import dataclass, field
+
+from protocol_server.capture import CLOSE, DATA, OPEN, CaptureReader
+
+
+@dataclass(slots=True)
+class Session:
+    """Captured connection; times are ns since the start of the replay."""
+
+    opened: int
+    chunks: list[tuple[int, memoryview]] = field(default_factory=list)
+    closed: int | None = None
+
+
+class Stats:
+    """Replay counters."""
+
+    def __init__(self):
+        self.connections = 0
+        self.chunks = 0
+        self.sent = 0
+        self.received = 0
+        # time.perf_counter() of the last chunk sent.
+        self.last_sent = 0.0
+        self.errors: Counter[str] = Counter()
+
+    def summary(self, elapsed: float) -> dict:
+        return {
+            "elapsed": elapsed,
+            "connections": self.connections,
+            "chunks": self.chunks,
+            "sent_bytes": self.sent,
+            "received_bytes": self.received,
+            "chunks_per_sec": self.chunks / elapsed,
+            "sent_mb_per_sec": self.sent / elapsed / 1e6,
+            "errors": dict(self.errors),
+        }
+
+
+def load(readers: list[CaptureReader]) -> list[Session]:
+    """Group chunks of all files by connection, on a common timeline."""
+    first = min(reader.started_ns for reader in readers)
+    sessions = []
+    for reader in readers:
+        offset = reader.started_ns - first
+        connections: dict[int, Session] = {}
+        for time_ns, connection, kind, data in reader:
+            at = offset + time_ns
+            if kind == OPEN:
+                connections[connection] = Session(at)
+                sessions.append(connections[connection])
+            elif kind == DATA:
+                connections[connection].chunks.append((at, data))
+            elif kind == CLOSE:
+                connections[connection].closed = at
+    sessions.sort(key=lambda session: session.opened)
+    return sessions
+
+
+class Replay:
+    """Replay sessions at a speed factor, 0 meaning as fast as possible."""
+
+    def __init__(self, args: argparse.Namespace, stats: Stats):
+        self.args = args
+        self.stats = stats
+        self.slots = asyncio.Semaphore(args.concurrency)
+        self.started = 0.0
+
+    async def wait_until(self, at_ns: int):
+        if self.args.speed:
+            delay = self.started + at_ns / 1e9 / self.args.speed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    async def run(self, sessions: list[Session]):
+        self.started = time.monotonic()
+        tasks = [asyncio.create_task(self.session(session)) for session in sessions]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # If a session failed, stop the others before the files close.
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.wait(tasks)
+
+    async def session(self, session: Session):
+        await self.wait_until(session.opened)
+        async with self.slots:
+            try:
+                await self.replay(session)
+            except (ConnectionError, asyncio.IncompleteReadError) as exc:
+                self.stats.errors[type(exc).__name__] += 1
+            except OSError as exc:
+                self.stats.errors[f"os_error_{exc.errno}"] += 1
+
+    async def replay(self, session: Session):
+        reader, writer = await asyncio.open_connection(self.args.host, self.args.port)
+        writer.get_extra_info("socket").setsockopt(
+            socket.IPPROTO_TCP, socket.TCP_NODELAY, 1
+        )
+        self.stats.connections += 1
+        responses = asyncio.create_task(self.read_responses(reader))
+        try:
+            for at, data in session.chunks:
+                await self.wait_until(at)
+                writer.write(data)
+                await writer.drain()
+                self.stats.chunks += 1
+                self.stats.sent += len(data)
+                self.stats.last_sent = time.perf_counter()
+            if session.closed is not None:
+                await self.wait_until(session.closed)
+            # Give the server time to answer the last chunks.
+            await asyncio.wait({responses}, timeout=self.args.linger)
+        finally:
+            responses.cancel()
+            writer.close()
+
+    async def read_responses(self, reader: asyncio.StreamReader):
+        while data := await reader.read(65536):
+            self.stats.received += len(data)
+
+
+async def replay_files(
+    args: argparse.Namespace, stats: Stats, readers: list[CaptureReader]
+) -> float:
+    """Replay all sessions of the readers, return the elapsed seconds."""
+    sessions = load(readers)
+    started = time.perf_counter()
+    await Replay(args, stats).run(sessions)
+    return max(stats.last_sent, started + 1e-9) - started
+
+
+async def main(args: argparse.Namespace) -> dict:
+    stats = Stats()
+    readers = [CaptureReader(path) for path in args.files]
+    # Views into the mapped files must be gone before they are closed, so
+    # sessions only live in the frame of replay_files().
+    try:
+        elapsed = await replay_files(args, stats, readers)
+    except BaseException as exc:
+        # The traceback keeps the failed frames and their views alive.
+        traceback.clear_frames(exc.__traceback__)
+        raise
+    finally:
+        for reader in readers:
+            reader.close()
+    return stats.summary(elapsed)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m tests.emulator.replay")
+    parser.add_argument("files", nargs="+", help="capture files")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="speed factor, 0 = max (default: 1)"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=1000, help="max open connections"
+    )
+    parser.add_argument(
+        "--linger",
+        type=float,
+        default=1.0,
+        help="seconds to wait for responses after the last chunk",
+    )
+    parser.add_argument("--json", help="write summary as JSON to this file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    summary = asyncio.run(main(args))
+    print(json.dumps(summary, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
@@ -1,19 +1,29 @@
 """Script to emulate vehicle session."""
 
-import struct
+import csv
 import datetime
 import socket
 import time
-import csv
 
 from teltonika import AcceptPacket
+from teltonika.crc import crc16
+from teltonika.encoder import (
+    AVL_HEADER,
+    CODEC_8,
+    CRC,
+    FRAME_HEADER,
+    NO_IO,
+    RECORD_COUNT,
+    Record,
+    encode_login,
+    group_io,
+    pack_record_into,
+    record_size,
+)
 
 
 def create_imei_packet(imei: str) -> bytes:
-    imei_bytes = imei.encode("ascii")
-    imei_length = len(imei_bytes)
-    packet = struct.pack(">H", imei_length) + imei_bytes
-    return packet
+    return encode_login(imei)
 
 
 def encode_codec8_avl_record(
@@ -32,49 +42,21 @@ def encode_codec8_avl_record(
     if timestamp is None:
         timestamp = int(datetime.datetime.now().timestamp() * 1000)
 
-    # Convert lat/lon to integer representation
-    lat = int(lat * 10_000_000)
-    lon = int(lon * 10_000_000)
-
-    # Start building the binary record
-    record = b""
-
-    # Timestamp: 8 bytes
-    record += struct.pack(">Q", timestamp)
-
-    # Priority: 1 byte
-    record += struct.pack("B", priority)
-
-    # GPS Element: 15 bytes
-    record += struct.pack(">i", lon)
-    record += struct.pack(">i", lat)
-    record += struct.pack(">H", altitude)
-    record += struct.pack(">H", angle)
-    record += struct.pack("B", satellites)
-    record += struct.pack(">H", speed)
-
-    # IO Element section
-    if io_elements is None:
-        io_elements = {}
-
-    # Event ID (1 byte) and total IO count (1 byte)
-    record += struct.pack("B", event_id)
-    record += struct.pack("B", len(io_elements))
-
-    # IO Elements (1 byte, 2 byte, 4 byte, 8 byte)
-    for size in (1, 2, 4, 8):
-        filtered = {
-            k: v
-            for k, v in io_elements.items()
-            if isinstance(v, int) and v.bit_length() <= size * 8
-        }
-        record += struct.pack("B", len(filtered))
-        for io_id, value in filtered.items():
-            fmt = {1: "B", 2: ">H", 4: ">I", 8: ">Q"}[size]
-            record += struct.pack("B", io_id)
-            record += struct.pack(fmt, value)
-
-    return record
+    record = Record(
+        timestamp=timestamp,
+        latitude=lat,
+        longitude=lon,
+        altitude=altitude,
+        angle=angle,
+        satellites=satellites,
+        speed=speed,
+        priority=priority,
+        event_id=event_id,
+        io_elements=group_io(io_elements) if io_elements else NO_IO,
+    )
+    buf = bytearray(record_size(record))
+    pack_record_into(buf, 0, record)
+    return bytes(buf)
 
 
 def create_codec8_message(
@@ -89,9 +71,6 @@ def create_codec8_message(
     event_id=0,
     io_elements=None,
 ):
-    codec_id = 0x08
-    avl_count = 1
-
     # Encode one AVL record
     avl_record = encode_codec8_avl_record(
         timestamp=timestamp,
@@ -106,36 +85,20 @@ def create_codec8_message(
         io_elements=io_elements,
     )
 
-    # Build data field
-    data = struct.pack("B", codec_id)
-    data += struct.pack("B", avl_count)
-    data += avl_record
-    data += struct.pack("B", avl_count)  # number of records again
+    return create_codec8_packet([avl_record])
 
-    data_length = struct.pack(">I", len(data))
 
-    # Calculate CRC16
-    crc = struct.pack(">I", crc16(data))
-
-    # Prepend data length (4 bytes) and append CRC (4 bytes)
-    tcp_message = b"\x00\x00\x00\x00"  # placeholder for 4 bytes AVL length
-
-    tcp_message = tcp_message + data_length + data + crc
-
-    return tcp_message
-
-
-def crc16(data: bytes) -> int:
-    """Calculate CRC-16-IBM."""
-    crc = 0x0000
-    for byte in data:
-        crc ^= byte
-        for _ in range(8):
-            if crc & 1:
-                crc = (crc >> 1) ^ 0xA001
-            else:
-                crc >>= 1
-    return crc & 0xFFFF
+def create_codec8_packet(avl_records: list[bytes]) -> bytes:
+    """Wrap encoded AVL records into a Codec 8 TCP message."""
+    avl_count = len(avl_records)
+    data = b"".join(
+        (
+            AVL_HEADER.pack(CODEC_8, avl_count),
+            *avl_records,
+            RECORD_COUNT.pack(avl_count),
+        )
+    )
+    return FRAME_HEADER.pack(0, len(data)) + data + CRC.pack(crc16(data))
 
 
 def vehicle_session(address: tuple[str, int], filename: str, imei: str, sleep: float):